@@ -0,0 +1,42 @@
+"""
+Response cache for agents
+- Process-local LRU with a TTL, keyed by a BLAKE2b digest of the request
+- Short-circuits identical upstream calls (repeated phrases, retried transcripts)
+"""
+import hashlib
+import time
+from collections import OrderedDict
+
+DEFAULT_TTL_SECONDS = 7 * 24 * 3600
+
+def cache_key(*parts: str) -> bytes:
+    """Hash request fields into a compact, fixed-size cache key."""
+    return hashlib.blake2b("|".join(parts).encode(), digest_size=16).digest()
+
+class ResponseCache:
+    """Bounded LRU mapping of cache_key -> response, with per-entry expiry."""
+
+    def __init__(self, maxsize: int = 2048, ttl: float = DEFAULT_TTL_SECONDS) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict[bytes, tuple[float, object]] = OrderedDict()
+
+    def get(self, key: bytes):
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: bytes, value) -> None:
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        self._data.clear()
@@ -0,0 +1,100 @@
+"""
+Shared HTTP client for agents
+- One long-lived httpx.AsyncClient with a keep-alive connection pool
+- Avoids a fresh TCP+TLS handshake on every agent call
+- orjson-backed JSON encode/decode helpers (stdlib json fallback)
+- msgpack content negotiation for internal (Coral / ML) service responses
+- Retries with exponential backoff on 429/5xx, reusing pooled connections
+"""
+import asyncio
+import json
+import random
+
+import httpx
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+try:
+    import ormsgpack as msgpack
+except ImportError:  # pragma: no cover
+    try:
+        import msgpack
+    except ImportError:
+        msgpack = None
+
+MSGPACK_TYPES = ("application/msgpack", "application/x-msgpack")
+# Internal services may answer in msgpack; JSON stays acceptable for older ones
+INTERNAL_ACCEPT = (
+    "application/msgpack, application/json;q=0.9" if msgpack is not None else "application/json"
+)
+
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+RETRY_BASE_DELAY = 0.1
+RETRY_MAX_DELAY = 1.0
+
+_CLIENT: httpx.AsyncClient | None = None
+
+def get_http_client() -> httpx.AsyncClient:
+    """Return the process-wide AsyncClient, creating it on first use."""
+    global _CLIENT
+    if _CLIENT is None or _CLIENT.is_closed:
+        _CLIENT = httpx.AsyncClient(
+            timeout=httpx.Timeout(10.0),
+            # Retries failed connection attempts; status-based retries live in post_with_retry.
+            # Pool limits go on the transport: httpx ignores the client's limits= when one is given.
+            transport=httpx.AsyncHTTPTransport(
+                retries=3,
+                limits=httpx.Limits(max_keepalive_connections=32, max_connections=64),
+            ),
+        )
+    return _CLIENT
+
+async def aclose_http_client() -> None:
+    """Close the shared client (called from the backend shutdown hook)."""
+    global _CLIENT
+    if _CLIENT is not None:
+        await _CLIENT.aclose()
+        _CLIENT = None
+
+def _retry_delay(response: httpx.Response, attempt: int) -> float:
+    """Honor Retry-After (seconds) when given, else exponential backoff with jitter."""
+    retry_after = response.headers.get("retry-after", "")
+    if retry_after.isdigit():
+        return min(float(retry_after), RETRY_MAX_DELAY)
+    return random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** attempt))
+
+async def post_with_retry(url: str, *, max_attempts: int = 3, **kwargs) -> httpx.Response:
+    """POST on the shared client, retrying transient 429/5xx answers.
+
+    Raises httpx.HTTPStatusError once attempts are exhausted or on any other
+    error status, like a plain ``raise_for_status()``.
+    """
+    client = get_http_client()
+    for attempt in range(1, max_attempts + 1):
+        response = await client.post(url, **kwargs)
+        if response.status_code not in RETRY_STATUSES or attempt == max_attempts:
+            response.raise_for_status()
+            return response
+        await asyncio.sleep(_retry_delay(response, attempt))
+
+def json_dumps(obj) -> bytes:
+    """Serialize a request body to JSON bytes."""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj).encode()
+
+def json_loads(data: bytes):
+    """Parse a JSON response body."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+def decode_response(response: httpx.Response):
+    """Decode an internal service response as msgpack or JSON, per its Content-Type."""
+    content_type = response.headers.get("content-type", "")
+    if msgpack is not None and content_type.startswith(MSGPACK_TYPES):
+        return msgpack.unpackb(response.content)
+    return json_loads(response.content)
@@ -4,7 +4,7 @@ Insurance Verification Agent
 - Exposes async functions for backend orchestrator
 """
 import os
-import httpx
+from agents.http_client import get_http_client, json_dumps, json_loads
 
 CROSSMINT_API_KEY = os.getenv("CROSSMINT_API_KEY", "demo")
 
@@ -16,11 +16,10 @@ async def verify_insurance(user_id: str) -> dict:
         "Content-Type": "application/json"
     }
     payload = {"user_id": user_id}
-    async with httpx.AsyncClient() as client:
-        response = await client.post(url, headers=headers, json=payload)
-        response.raise_for_status()
-        data = response.json()
-        return {
-            "verified": data.get("verified", False),
-            "provider": data.get("provider", "Unknown")
-        }
+    response = await get_http_client().post(url, headers=headers, content=json_dumps(payload))
+    response.raise_for_status()
+    data = json_loads(response.content)
+    return {
+        "verified": data.get("verified", False),
+        "provider": data.get("provider", "Unknown")
+    }
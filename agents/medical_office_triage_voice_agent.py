@@ -1,17 +1,16 @@
 """
 Medical Office Triage Voice Agent
 - Collects history, follows protocols, HIPAA-compliant
+- Works from the transcript produced by the voice interface (no second STT pass)
 - Exposes async functions for backend orchestrator
 """
 import os
-import httpx
+from agents.http_client import INTERNAL_ACCEPT, decode_response, json_dumps, post_with_retry
 
-async def collect_history(audio_bytes: bytes) -> dict:
-    """Collects medical history from audio using the Coral Medical Office Triage API."""
+async def collect_history(transcript: str) -> dict:
+    """Collects medical history from a call transcript using the Coral Medical Office Triage API."""
     url = os.getenv("MEDICAL_OFFICE_TRIAGE_API_URL", "http://coral_medicaloffice:8010/collect-history")
-    headers = {"Content-Type": "application/octet-stream"}
-    async with httpx.AsyncClient() as client:
-        response = await client.post(url, headers=headers, content=audio_bytes)
-        response.raise_for_status()
-        data = response.json()
-        return {"history": data.get("history", "No history found."), "bytes": data.get("bytes")}
+    headers = {"Content-Type": "application/json", "Accept": INTERNAL_ACCEPT}
+    response = await post_with_retry(url, headers=headers, content=json_dumps({"text": transcript}))
+    data = decode_response(response)
+    return {"history": data.get("history", "No history found."), "bytes": data.get("bytes")}
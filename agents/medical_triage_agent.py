@@ -1,26 +1,35 @@
 """
 Medical Triage Agent
 - Integrates with Mistral AI for symptom analysis and ESI classification
+- Caches results for repeated transcripts (e.g. client retries)
 - Exposes async functions for backend orchestrator
 """
 import os
-import httpx
+from agents.cache import ResponseCache, cache_key
+from agents.http_client import get_http_client, json_dumps, json_loads
 
 MISTRAL_API_KEY = os.getenv("MISTRAL_API_KEY", "demo")
 
+_CACHE = ResponseCache(maxsize=1024)
+
 async def analyze_symptoms(symptoms: str, language: str = "en") -> dict:
     """Send symptoms to Mistral AI for ESI classification."""
+    key = cache_key(language, symptoms)
+    cached = _CACHE.get(key)
+    if cached is not None:
+        return dict(cached)
     url = "https://api.mistral.ai/v1/medical/triage"
     headers = {
         "Authorization": f"Bearer {MISTRAL_API_KEY}",
         "Content-Type": "application/json"
     }
     payload = {"symptoms": symptoms, "language": language}
-    async with httpx.AsyncClient() as client:
-        response = await client.post(url, headers=headers, json=payload)
-        response.raise_for_status()
-        data = response.json()
-        return {
-            "esi_level": data.get("esi_level", 3),
-            "analysis": data.get("analysis", "No analysis available.")
-        }
+    response = await get_http_client().post(url, headers=headers, content=json_dumps(payload))
+    response.raise_for_status()
+    data = json_loads(response.content)
+    result = {
+        "esi_level": data.get("esi_level", 3),
+        "analysis": data.get("analysis", "No analysis available.")
+    }
+    _CACHE.set(key, result)
+    return dict(result)
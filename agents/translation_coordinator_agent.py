@@ -1,26 +1,110 @@
 """
 Translation Coordinator Agent
 - Specialized for medical translations
+- Coalesces concurrent requests into one batched Gemini call per target language
+- Caches translations of repeated strings (e.g. "ESI Level: 3")
+- Skips the round-trip when the target is already the system language
 - Exposes async functions for backend orchestrator
 """
+import asyncio
 import os
-import httpx
+from agents.cache import ResponseCache, cache_key
+from agents.http_client import json_dumps, json_loads, post_with_retry
 
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+TRANSLATE_URL = "https://api.gemini.com/v1/translate"  # Replace with Gemini's actual endpoint if different
+SYSTEM_LANG = os.getenv("SYSTEM_LANG", "en")
 
-async def translate_medical(text: str, target_language: str) -> str:
-    """Translate text to target language using Gemini API."""
-    url = "https://api.gemini.com/v1/translate"  # Replace with Gemini's actual endpoint if different
+FLUSH_MS = float(os.getenv("TRANSLATION_BATCH_FLUSH_MS", "10"))
+MAX_BATCH = int(os.getenv("TRANSLATION_BATCH_MAX", "16"))
+
+def normalize_language(code: str | None) -> str:
+    """Reduce a BCP-47 tag to its lowercase primary subtag ("en-US" -> "en")."""
+    return (code or "").strip().replace("_", "-").split("-")[0].lower()
+
+async def _post_translations(texts: list[str], target_language: str) -> list[str]:
+    """Translate a list of strings to one target language in a single request."""
     headers = {
         "Authorization": f"Bearer {GEMINI_API_KEY}",
         "Content-Type": "application/json"
     }
     payload = {
-        "q": text,
+        "q": texts,
         "target": target_language
     }
-    async with httpx.AsyncClient() as client:
-        response = await client.post(url, json=payload, headers=headers)
-        response.raise_for_status()
-        data = response.json()
-        return data.get("translatedText", text)
+    response = await post_with_retry(TRANSLATE_URL, content=json_dumps(payload), headers=headers)
+    data = json_loads(response.content)
+    translated = data.get("translatedText", texts)
+    if isinstance(translated, str):
+        translated = [translated]
+    # Fall back to the source text for anything the API did not return
+    return [translated[i] if i < len(translated) else text for i, text in enumerate(texts)]
+
+class TranslationBatcher:
+    """Collects translate calls arriving within ``flush_ms`` and sends them as one batch.
+
+    Each caller awaits a future for its own item; batches are split by target
+    language because the endpoint translates to a single target per request.
+    """
+
+    def __init__(self, flush_ms: float = FLUSH_MS, max_batch: int = MAX_BATCH) -> None:
+        self.flush_s = flush_ms / 1000
+        self.max_batch = max_batch
+        self._queue: asyncio.Queue | None = None
+        self._worker: asyncio.Task | None = None
+
+    async def translate(self, text: str, target_language: str) -> str:
+        loop = asyncio.get_running_loop()
+        if self._worker is None or self._worker.done() or self._worker.get_loop() is not loop:
+            self._queue = asyncio.Queue()
+            self._worker = loop.create_task(self._run())
+        future = loop.create_future()
+        self._queue.put_nowait((text, target_language, future))
+        return await future
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.flush_s
+            while len(batch) < self.max_batch:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+
+            by_target: dict[str, list] = {}
+            for item in batch:
+                by_target.setdefault(item[1], []).append(item)
+            await asyncio.gather(*(self._flush(target, items) for target, items in by_target.items()))
+
+    async def _flush(self, target_language: str, items: list) -> None:
+        try:
+            translated = await _post_translations([text for text, _, _ in items], target_language)
+        except Exception as e:  # noqa
+            for _, _, future in items:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, _, future), result in zip(items, translated):
+            if not future.done():
+                future.set_result(result)
+
+_BATCHER = TranslationBatcher()
+_CACHE = ResponseCache(maxsize=2048)
+
+async def translate_medical(text: str, target_language: str) -> str:
+    """Translate text to target language using Gemini API."""
+    # Source strings are in the system language already; nothing to do
+    if not text or normalize_language(target_language) == normalize_language(SYSTEM_LANG):
+        return text
+    key = cache_key(target_language, text)
+    cached = _CACHE.get(key)
+    if cached is not None:
+        return cached
+    translated = await _BATCHER.translate(text, target_language)
+    _CACHE.set(key, translated)
+    return translated
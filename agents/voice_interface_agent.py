@@ -5,7 +5,7 @@ Voice Interface Agent
 - Exposes async functions for backend orchestrator
 """
 import os
-import httpx
+from agents.http_client import get_http_client, json_dumps, json_loads
 
 ELEVENLABS_API_KEY = os.getenv("ELEVENLABS_API_KEY")
 
@@ -17,15 +17,14 @@ async def transcribe_audio(audio_bytes: bytes, language: str = "auto") -> dict:
         "Content-Type": "application/octet-stream"
     }
     params = {"language": language}
-    async with httpx.AsyncClient() as client:
-        response = await client.post(url, params=params, headers=headers, content=audio_bytes)
-        response.raise_for_status()
-        data = response.json()
-        return {
-            "text": data.get("text", ""),
-            "language": data.get("language", language),
-            "panic": data.get("panic", False)
-        }
+    response = await get_http_client().post(url, params=params, headers=headers, content=audio_bytes)
+    response.raise_for_status()
+    data = json_loads(response.content)
+    return {
+        "text": data.get("text", ""),
+        "language": data.get("language", language),
+        "panic": data.get("panic", False)
+    }
 
 async def synthesize_speech(text: str, language: str = "en") -> bytes:
     """Synthesize speech using ElevenLabs."""
@@ -35,7 +34,6 @@ async def synthesize_speech(text: str, language: str = "en") -> bytes:
         "Content-Type": "application/json"
     }
     payload = {"text": text, "language": language}
-    async with httpx.AsyncClient() as client:
-        response = await client.post(url, headers=headers, json=payload)
-        response.raise_for_status()
-        return response.content
+    response = await get_http_client().post(url, headers=headers, content=json_dumps(payload))
+    response.raise_for_status()
+    return response.content
@@ -12,59 +12,156 @@ from agents import (
     voice_interface_agent,
 )
 
+from agents.http_client import get_http_client
+
 import asyncio
+import logging
+import os
 
-async def run_emergency_flow(audio_bytes: bytes, user_language: str = "auto") -> dict:
-    """Run full emergency flow with resilient fallbacks.
-    Each agent call is wrapped so one failure doesn't break the whole workflow.
+logger = logging.getLogger("globalmed.orchestrator")
+
+# Upper bound for an agent call with no budget of its own; a hung agent contributes its fallback
+AGENT_TIMEOUT_SECONDS = float(os.getenv("AGENT_TIMEOUT_SECONDS", "5"))
+# Per-agent budgets reflect criticality: voice/triage get the most room.
+# Each one can be overridden with AGENT_TIMEOUT_<TAG>, e.g. AGENT_TIMEOUT_INSURANCE_AGENT=1.5
+AGENT_TIMEOUTS = {
+    tag: float(os.getenv(f"AGENT_TIMEOUT_{tag.upper()}", seconds))
+    for tag, seconds in {
+        "voice_interface": 4.0,
+        "medical_triage": 3.0,
+        "translation": 2.0,
+        "history_agent": 3.0,
+        "vitals_agent": 3.0,
+        "insurance_agent": 2.0,
+    }.items()
+}
+# Hard deadline for the whole emergency flow; unfinished agents use their fallback
+FLOW_TIMEOUT_SECONDS = float(os.getenv("FLOW_TIMEOUT_SECONDS", "8"))
+
+# Hosts on the emergency critical path; pre-connected so the first real call
+# does not pay DNS + TCP + TLS setup. Override with a comma-separated WARMUP_URLS.
+WARMUP_URLS = [u for u in os.getenv("WARMUP_URLS", "").split(",") if u] or [
+    "https://api.elevenlabs.io",
+    "https://api.mistral.ai",
+    "https://api.gemini.com",
+    "https://api.crossmint.com",
+    os.getenv("MEDICAL_OFFICE_TRIAGE_API_URL", "http://coral_medicaloffice:8010/collect-history"),
+]
+WARMUP_INTERVAL_SECONDS = float(os.getenv("WARMUP_INTERVAL_SECONDS", "60"))
+
+async def warmup(urls: list[str] | None = None) -> None:
+    """HEAD each known host on the shared client so pooled connections are hot."""
+    client = get_http_client()
+    await asyncio.gather(*(client.head(url) for url in urls or WARMUP_URLS), return_exceptions=True)
+
+async def keep_warm(interval: float = WARMUP_INTERVAL_SECONDS) -> None:
+    """Warm up now, then re-ping periodically so idle keep-alives are not dropped."""
+    while True:
+        await warmup()
+        await asyncio.sleep(interval)
+
+def _fallback_value(fallback, tag: str, error: BaseException):
+    """Build a fallback: a dict gets an ``error`` entry, a callable gets the error message."""
+    # Timeouts carry no message; the exception type is more useful than an empty string
+    message = str(error) or type(error).__name__
+    if callable(fallback):
+        return fallback(message)
+    return {**fallback, "error": f"{tag}: {message}"}
+
+async def _safe(coro, fallback, tag: str, timeout: float | None = None):
+    """Await an agent call with a deadline, returning a fallback if it fails.
+
+    ``timeout`` defaults to the agent's entry in AGENT_TIMEOUTS.
     """
-    # Voice transcription
+    if timeout is None:
+        timeout = AGENT_TIMEOUTS.get(tag, AGENT_TIMEOUT_SECONDS)
     try:
-        voice_result = await voice_interface_agent.transcribe_audio(audio_bytes, language=user_language)
+        return await asyncio.wait_for(coro, timeout=timeout)
     except Exception as e:  # noqa
-        voice_result = {"text": "", "language": user_language, "panic": False, "error": f"voice_interface: {e}"}
+        logger.warning("%s failed: %r", tag, e)
+        return _fallback_value(fallback, tag, e)
 
-    # Medical triage (ESI)
-    try:
-        triage_result = await medical_triage_agent.analyze_symptoms(voice_result.get("text", ""), language=voice_result.get("language", user_language))
-    except Exception as e:  # noqa
-        triage_result = {"esi_level": 5, "analysis": "unavailable", "error": f"medical_triage: {e}"}
+class _EmergencyFlow:
+    """Collects agent results as they finish so a flow deadline still yields a partial result."""
 
-    # Translation
-    try:
-        translation = await translation_coordinator_agent.translate_medical(
-            f"ESI Level: {triage_result.get('esi_level', 'unknown')}", voice_result.get("language", user_language)
-        )
-    except Exception as e:  # noqa
-        translation = f"translation_error: {e}"
+    def __init__(self, user_language: str) -> None:
+        # result key -> (agent tag, fallback)
+        self.fallbacks = {
+            "voice": ("voice_interface", {"text": "", "language": user_language, "panic": False}),
+            "triage": ("medical_triage", {"esi_level": 5, "analysis": "unavailable"}),
+            "translation": ("translation", lambda message: f"translation_error: {message}"),
+            "history": ("history_agent", {"history": "unavailable"}),
+            "vitals": ("vitals_agent", {"stress_level": "unknown", "heart_rate": 0}),
+            "insurance": ("insurance_agent", {"verified": False, "provider": "Unknown"}),
+        }
+        self.results: dict = {}
 
-    # History collection
-    try:
-        history = await medical_office_triage_voice_agent.collect_history(audio_bytes)
-    except Exception as e:  # noqa
-        history = {"history": "unavailable", "error": f"history_agent: {e}"}
+    async def run(self, key: str, coro):
+        tag, fallback = self.fallbacks[key]
+        self.results[key] = await _safe(coro, fallback, tag)
+        return self.results[key]
 
-    # Vital signs
-    try:
-        vitals = await vital_signs_monitor_agent.analyze_vitals(audio_bytes)
-    except Exception as e:  # noqa
-        vitals = {"stress_level": "unknown", "heart_rate": 0, "error": f"vitals_agent: {e}"}
+    def fill_missing(self, error: BaseException) -> None:
+        for key, (tag, fallback) in self.fallbacks.items():
+            if key not in self.results:
+                self.results[key] = _fallback_value(fallback, tag, error)
+
+async def _triage_translate(flow: _EmergencyFlow, text: str, language: str) -> None:
+    """ESI triage, then the translated ESI level (its only dependency)."""
+    triage_result = await flow.run(
+        "triage", medical_triage_agent.analyze_symptoms(text, language=language)
+    )
+    await flow.run(
+        "translation",
+        translation_coordinator_agent.translate_medical(
+            f"ESI Level: {triage_result.get('esi_level', 'unknown')}", language
+        ),
+    )
+
+async def _voice_chain(flow: _EmergencyFlow, audio_bytes: bytes, user_language: str) -> None:
+    """Transcribe once, then fan the transcript out to triage and history."""
+    voice_result = await flow.run(
+        "voice", voice_interface_agent.transcribe_audio(audio_bytes, language=user_language)
+    )
+    text = voice_result.get("text", "")
+    language = voice_result.get("language", user_language)
 
-    # Insurance verification
+    async with asyncio.TaskGroup() as tg:
+        tg.create_task(_triage_translate(flow, text, language))
+        tg.create_task(flow.run("history", medical_office_triage_voice_agent.collect_history(text)))
+
+async def run_emergency_flow(audio_bytes: bytes, user_language: str = "auto") -> dict:
+    """Run full emergency flow with resilient fallbacks.
+    Each agent call is wrapped so one failure doesn't break the whole workflow.
+    Speech recognition runs once; history collection reuses the transcript.
+    Vitals and insurance only need the raw audio / user, so they run
+    concurrently with the voice -> (triage -> translation | history) chain.
+    Every agent has its own time budget and the whole flow is bounded by
+    FLOW_TIMEOUT_SECONDS; anything unfinished by then contributes its fallback.
+    """
+    flow = _EmergencyFlow(user_language)
     try:
-        insurance = await insurance_verification_agent.verify_insurance("REPLACE_WITH_REAL_USER_ID")
-    except Exception as e:  # noqa
-        insurance = {"verified": False, "provider": "Unknown", "error": f"insurance_agent: {e}"}
+        async with asyncio.timeout(FLOW_TIMEOUT_SECONDS):
+            async with asyncio.TaskGroup() as tg:
+                tg.create_task(_voice_chain(flow, audio_bytes, user_language))
+                tg.create_task(flow.run("vitals", vital_signs_monitor_agent.analyze_vitals(audio_bytes)))
+                tg.create_task(flow.run(
+                    "insurance", insurance_verification_agent.verify_insurance("REPLACE_WITH_REAL_USER_ID")
+                ))
+    except TimeoutError:
+        logger.warning("emergency flow exceeded %.1fs; returning partial result", FLOW_TIMEOUT_SECONDS)
+        flow.fill_missing(TimeoutError("flow deadline exceeded"))
+    results = flow.results
 
     # Dispatch placeholder retained (removed original emergency dispatch agent)
     dispatch = {"status": "pending", "location": "unknown"}
 
     return {
-        "voice": voice_result,
-        "triage": triage_result,
-        "translation": translation,
-        "history": history,
-        "vitals": vitals,
+        "voice": results["voice"],
+        "triage": results["triage"],
+        "translation": results["translation"],
+        "history": results["history"],
+        "vitals": results["vitals"],
         "dispatch": dispatch,
-        "insurance": insurance,
+        "insurance": results["insurance"],
     }
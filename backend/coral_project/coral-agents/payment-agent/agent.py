@@ -1,20 +1,39 @@
 from fastapi import FastAPI
-import requests
+import asyncio
+import httpx
 import os
+import random
+import uuid
 
 app = FastAPI()
 
 CROSSMINT_API_KEY = os.getenv("CROSSMINT_API_KEY")
 
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+MAX_ATTEMPTS = 3
+
+# Shared client so concurrent payments reuse pooled keep-alive connections.
+# Limits go on the transport: the client's own limits= is ignored once transport= is set.
+client = httpx.AsyncClient(
+    timeout=10.0,
+    transport=httpx.AsyncHTTPTransport(retries=3, limits=httpx.Limits(max_keepalive_connections=20)),
+)
+
+@app.on_event("shutdown")
+async def close_client():
+    await client.aclose()
+
 @app.get("/health")
 def health():
     return {"status": "ok"}
 
 @app.post("/pay")
-def make_payment(amount: float, recipient: str):
+async def make_payment(amount: float, recipient: str):
     headers = {
         "Authorization": f"Bearer {CROSSMINT_API_KEY}",
-        "Content-Type": "application/json"
+        "Content-Type": "application/json",
+        # Same key on every attempt so a retried POST cannot charge twice
+        "Idempotency-Key": str(uuid.uuid4()),
     }
     # Example Crossmint endpoint (adjust based on docs)
     url = "https://staging.crossmint.com/api/payments"
@@ -22,5 +41,10 @@ def make_payment(amount: float, recipient: str):
         "amount": amount,
         "recipient": recipient,
     }
-    r = requests.post(url, json=payload, headers=headers)
-    return r.json()
+    for attempt in range(1, MAX_ATTEMPTS + 1):
+        r = await client.post(url, json=payload, headers=headers)
+        if r.status_code not in RETRY_STATUSES or attempt == MAX_ATTEMPTS:
+            return r.json()
+        retry_after = r.headers.get("retry-after", "")
+        delay = float(retry_after) if retry_after.isdigit() else random.uniform(0, 0.1 * 2 ** attempt)
+        await asyncio.sleep(min(delay, 1.0))
@@ -1,11 +1,12 @@
+import functools
 import logging
 import urllib.parse
 from dataclasses import dataclass, field
-from typing import Optional
+from typing import ClassVar, Optional
 
 from dotenv import load_dotenv
 import os
-from livekit.agents import JobContext, WorkerOptions, cli, mcp
+from livekit.agents import JobContext, JobProcess, WorkerOptions, cli, mcp
 from livekit.agents.llm import function_tool
 from livekit.agents.voice import Agent, AgentSession, RunContext
 from livekit.plugins import cartesia, deepgram, openai, silero, groq
@@ -18,12 +19,9 @@ logger.setLevel(logging.INFO)
 
 load_dotenv()
 
-def get_llm_instance():
-    """Get LLM instance based on environment configuration"""
-    llm_provider = os.getenv("LLM_PROVIDER", "openai").lower()
-    llm_model = os.getenv("LLM_MODEL", "gpt-4o-mini")
-    api_key = os.getenv("API_KEY")
-    
+@functools.lru_cache(maxsize=8)
+def _build_llm(llm_provider: str, llm_model: str, api_key: Optional[str]):
+    """Build (once per provider/model/key) an LLM client shared by all agents"""
     if llm_provider == "openai":
         return openai.LLM(model=llm_model, api_key=api_key)
     elif llm_provider == "groq":
@@ -33,6 +31,28 @@ def get_llm_instance():
         logger.warning(f"Unsupported LLM provider: {llm_provider}. Falling back to OpenAI.")
         return openai.LLM(model=llm_model, api_key=api_key)
 
+def get_llm_instance():
+    """Get LLM instance based on environment configuration"""
+    llm_provider = os.getenv("LLM_PROVIDER", "openai").lower()
+    llm_model = os.getenv("LLM_MODEL", "gpt-4o-mini")
+    api_key = os.getenv("API_KEY")
+    return _build_llm(llm_provider, llm_model, api_key)
+
+@functools.lru_cache(maxsize=1)
+def get_vad():
+    """Load the Silero VAD model weights once and share them across agents"""
+    return silero.VAD.load()
+
+@functools.lru_cache(maxsize=1)
+def get_stt():
+    """Single Deepgram STT plugin; streams are opened per session from it"""
+    return deepgram.STT()
+
+@functools.lru_cache(maxsize=1)
+def get_tts():
+    """Single Cartesia TTS plugin; streams are opened per session from it"""
+    return cartesia.TTS()
+
 @dataclass
 class UserData:
     """Stores data and agents to be shared across the session"""
@@ -40,19 +60,48 @@ class UserData:
     prev_agent: Optional[Agent] = None
     ctx: Optional[JobContext] = None
 
-    def summarize(self) -> str:
+    @functools.cached_property
+    def summary(self) -> str:
+        # Cached per session; `del userdata.summary` if it ever depends on mutable fields
         return "User data: Medical office triage system"
 
+    def summarize(self) -> str:
+        return self.summary
+
 RunContext_T = RunContext[UserData]
 
+FUNCTION_CALL_TYPES = frozenset({"function_call", "function_call_output"})
+
 class BaseAgent(Agent):
+    agent_name: ClassVar[str] = "BaseAgent"
+    SYSTEM_MSG_TPL: ClassVar[str] = "You are the {name}. {summary}"
+
+    def __init_subclass__(cls, **kwargs) -> None:
+        super().__init_subclass__(**kwargs)
+        cls.agent_name = cls.__name__
+
+    def __init__(self, instructions: str) -> None:
+        # All personas share one STT/LLM/TTS/VAD instance instead of building their own
+        super().__init__(
+            instructions=instructions,
+            stt=get_stt(),
+            llm=get_llm_instance(),
+            tts=get_tts(),
+            vad=get_vad()
+        )
+        # Ids of items already in this agent's chat context, grown incrementally
+        self._known_item_ids: set[str] = set()
+        self._known_item_count = 0
+        self._known_tail_id: Optional[str] = None
+        # Built on first entry (needs the session's userdata), reused on every handoff
+        self._system_msg: Optional[str] = None
+
     async def on_enter(self) -> None:
-        agent_name = self.__class__.__name__
-        logger.info(f"Entering {agent_name}")
+        logger.info("Entering %s", self.agent_name)
 
         userdata: UserData = self.session.userdata
         if userdata.ctx and userdata.ctx.room:
-            await userdata.ctx.room.local_participant.set_attributes({"agent": agent_name})
+            await userdata.ctx.room.local_participant.set_attributes({"agent": self.agent_name})
 
         chat_ctx = self.chat_ctx.copy()
 
@@ -60,17 +109,30 @@ class BaseAgent(Agent):
             items_copy = self._truncate_chat_ctx(
                 userdata.prev_agent.chat_ctx.items, keep_function_call=True
             )
-            existing_ids = {item.id for item in chat_ctx.items}
+            existing_ids = self._sync_item_ids(chat_ctx.items)
             items_copy = [item for item in items_copy if item.id not in existing_ids]
             chat_ctx.items.extend(items_copy)
 
-        chat_ctx.add_message(
-            role="system",
-            content=f"You are the {agent_name}. {userdata.summarize()}"
-        )
+        if self._system_msg is None:
+            self._system_msg = self.SYSTEM_MSG_TPL.format(
+                name=self.agent_name, summary=userdata.summarize()
+            )
+        chat_ctx.add_message(role="system", content=self._system_msg)
         await self.update_chat_ctx(chat_ctx)
         self.session.generate_reply()
 
+    def _sync_item_ids(self, items: list) -> set[str]:
+        """Return the ids in ``items``, only hashing items appended since the last call."""
+        count = self._known_item_count
+        if count > len(items) or (count and items[count - 1].id != self._known_tail_id):
+            # Context was truncated or rewritten: start over
+            self._known_item_ids = set()
+            count = 0
+        self._known_item_ids.update(item.id for item in items[count:])
+        self._known_item_count = len(items)
+        self._known_tail_id = items[-1].id if items else None
+        return self._known_item_ids
+
     def _truncate_chat_ctx(
         self,
         items: list,
@@ -82,22 +144,24 @@ class BaseAgent(Agent):
         def _valid_item(item) -> bool:
             if not keep_system_message and item.type == "message" and item.role == "system":
                 return False
-            if not keep_function_call and item.type in ["function_call", "function_call_output"]:
+            if not keep_function_call and item.type in FUNCTION_CALL_TYPES:
                 return False
             return True
 
-        new_items = []
-        for item in reversed(items):
-            if _valid_item(item):
-                new_items.append(item)
-            if len(new_items) >= keep_last_n_messages:
-                break
-        new_items = new_items[::-1]
+        # Walk backwards once to find where the last n valid items start
+        start, count = len(items), 0
+        while start > 0 and count < keep_last_n_messages:
+            start -= 1
+            if _valid_item(items[start]):
+                count += 1
 
-        while new_items and new_items[0].type in ["function_call", "function_call_output"]:
-            new_items.pop(0)
+        # Never open the window on a dangling function call / output
+        while start < len(items) and (
+            not _valid_item(items[start]) or items[start].type in FUNCTION_CALL_TYPES
+        ):
+            start += 1
 
-        return new_items
+        return [item for item in items[start:] if _valid_item(item)]
 
     async def _transfer_to_agent(self, name: str, context: RunContext_T) -> Agent:
         """Transfer to another agent while preserving context"""
@@ -111,13 +175,7 @@ class BaseAgent(Agent):
 
 class TriageAgent(BaseAgent):
     def __init__(self) -> None:
-        super().__init__(
-            instructions=load_prompt('triage_prompt.yaml'),
-            stt=deepgram.STT(),
-            llm=get_llm_instance(),
-            tts=cartesia.TTS(),
-            vad=silero.VAD.load()
-        )
+        super().__init__(instructions=load_prompt('triage_prompt.yaml'))
 
     @function_tool
     async def transfer_to_support(self, context: RunContext_T) -> Agent:
@@ -132,13 +190,7 @@ class TriageAgent(BaseAgent):
 
 class SupportAgent(BaseAgent):
     def __init__(self) -> None:
-        super().__init__(
-            instructions=load_prompt('support_prompt.yaml'),
-            stt=deepgram.STT(),
-            llm=get_llm_instance(),
-            tts=cartesia.TTS(),
-            vad=silero.VAD.load()
-        )
+        super().__init__(instructions=load_prompt('support_prompt.yaml'))
 
     @function_tool
     async def transfer_to_triage(self, context: RunContext_T) -> Agent:
@@ -153,13 +205,7 @@ class SupportAgent(BaseAgent):
 
 class BillingAgent(BaseAgent):
     def __init__(self) -> None:
-        super().__init__(
-            instructions=load_prompt('billing_prompt.yaml'),
-            stt=deepgram.STT(),
-            llm=get_llm_instance(),
-            tts=cartesia.TTS(),
-            vad=silero.VAD.load()
-        )
+        super().__init__(instructions=load_prompt('billing_prompt.yaml'))
 
     @function_tool
     async def transfer_to_triage(self, context: RunContext_T) -> Agent:
@@ -172,6 +218,11 @@ class BillingAgent(BaseAgent):
         return await self._transfer_to_agent("support", context)
 
 
+def prewarm(proc: JobProcess):
+    """Load the VAD model when the worker process starts, before any call arrives"""
+    get_vad()
+
+
 async def entrypoint(ctx: JobContext):
     await ctx.connect()
 
@@ -214,4 +265,4 @@ async def entrypoint(ctx: JobContext):
     )
 
 if __name__ == "__main__":
-    cli.run_app(WorkerOptions(entrypoint_fnc=entrypoint))
+    cli.run_app(WorkerOptions(entrypoint_fnc=entrypoint, prewarm_fnc=prewarm))
@@ -5,29 +5,45 @@ GlobalMedTriage FastAPI backend entrypoint.
 - JWT authentication
 - API endpoints for triage, logs, and protocols
 """
+import asyncio
+import base64
+import logging
 import os
-from fastapi import FastAPI, WebSocket, Depends, HTTPException
+import orjson
+from argon2 import PasswordHasher
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Depends, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from fastapi.security import OAuth2PasswordBearer
-from jose import JWTError, jwt
+import jwt
 from dotenv import load_dotenv
 # Support running both as a package (backend.main) and as a script (python backend/main.py)
 try:
     from .utils import redact_pii  # type: ignore
+    from .agent_orchestrator import keep_warm, run_emergency_flow  # type: ignore
 except ImportError:  # pragma: no cover
     from utils import redact_pii  # type: ignore
+    from agent_orchestrator import keep_warm, run_emergency_flow  # type: ignore
+from agents import medical_triage_agent, translation_coordinator_agent
+from agents.http_client import aclose_http_client
 
 load_dotenv()
 
-app = FastAPI(title="GlobalMedTriage API")
+logger = logging.getLogger("globalmed.api")
 
-# CORS for frontend
+# orjson serializes every REST response (C extension, emits bytes directly)
+app = FastAPI(title="GlobalMedTriage API", default_response_class=ORJSONResponse)
+
+# CORS for frontend: pinned origins/methods/headers let Starlette precompute
+# the response headers instead of echoing them back per request.
+# Comma-separated CORS_ORIGINS; "*" is honoured but disables credentials.
+CORS_ORIGINS = [o.strip() for o in os.getenv("CORS_ORIGINS", "http://localhost:3000").split(",") if o.strip()]
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+    allow_origins=CORS_ORIGINS,
+    allow_credentials="*" not in CORS_ORIGINS,
+    allow_methods=["GET", "POST", "PUT", "DELETE"],
+    allow_headers=["authorization", "content-type"],
 )
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/token")
@@ -35,78 +51,295 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/token")
 JWT_SECRET = os.getenv("JWT_SECRET", "changeme")
 ALGORITHM = "HS256"
 
+# Passwords are hashed server-side (Argon2id, C-backed); one hasher is shared by all requests
+PASSWORD_HASHER = PasswordHasher(time_cost=2, memory_cost=65536, parallelism=1)
+# Each hash takes 64 MiB; cap how many run at once so a bulk request cannot balloon RSS
+_HASH_SLOTS = asyncio.Semaphore(int(os.getenv("PASSWORD_HASH_CONCURRENCY", 4)))
+
+async def hash_password(password: str) -> str:
+    # Argon2 is deliberately CPU/memory heavy; keep it off the event loop
+    async with _HASH_SLOTS:
+        return await asyncio.to_thread(PASSWORD_HASHER.hash, password)
+
 # --- Auth utils ---
 def verify_jwt(token: str = Depends(oauth2_scheme)):
     try:
         payload = jwt.decode(token, JWT_SECRET, algorithms=[ALGORITHM])
         return payload
-    except JWTError:
+    except jwt.InvalidTokenError:
         raise HTTPException(status_code=401, detail="Invalid token")
 
 @app.get("/api/health")
 def health():
     return {"status": "ok"}
 
-# --- Persistence helper for triage_logs ---
-import json
+@app.on_event("startup")
+async def warm_agent_connections():
+    # Pre-open pooled connections to agent hosts and keep them alive while idle
+    app.state.warmup_task = asyncio.create_task(keep_warm())
+
+@app.on_event("shutdown")
+async def close_agent_http_client():
+    # Agents share one pooled httpx client; release its connections on exit
+    warmup_task = getattr(app.state, "warmup_task", None)
+    if warmup_task is not None:
+        warmup_task.cancel()
+    await aclose_http_client()
+
+# --- Database connection pool ---
 import asyncpg
 from datetime import datetime
 
-async def save_triage_log(*, user_id: int | None, language: str | None, symptoms: str, esi_level: int | None, agent_responses: dict):
-    db_url = os.getenv("DATABASE_URL")
-    if not db_url:
+# Read once at import; load_dotenv() above has already populated the environment
+DATABASE_URL = os.getenv("DATABASE_URL")
+# Every uvicorn worker process opens its own pool, so connections scale with the worker
+# count. Conservative default: at most 4 workers unless WEB_CONCURRENCY says otherwise.
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", min(os.cpu_count() or 1, 4)))
+# Connections all workers together may hold; stays under Postgres' default max_connections=100
+DB_MAX_CONNECTIONS = int(os.getenv("DB_MAX_CONNECTIONS", 80))
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", max(DB_MAX_CONNECTIONS // WEB_CONCURRENCY, 1)))
+DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", min(10, DB_POOL_MAX_SIZE)))
+DB_ACQUIRE_TIMEOUT = float(os.getenv("DB_ACQUIRE_TIMEOUT", 2.0))
+# Bound each connect attempt (asyncpg's default is 60s) and, after a failure, answer 503
+# straight away for DB_RETRY_BACKOFF seconds instead of queueing every request behind a retry
+DB_CONNECT_TIMEOUT = float(os.getenv("DB_CONNECT_TIMEOUT", 5.0))
+DB_RETRY_BACKOFF = float(os.getenv("DB_RETRY_BACKOFF", 5.0))
+# Per-connection LRU of server-side prepared statements; every query here is
+# parameterized, so each SQL string is parsed/planned once per connection
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", 1024))
+# Ping pooled connections on acquire so a server-side drop is caught before the query
+DB_PRE_PING = os.getenv("DB_PRE_PING", "1") == "1"
+
+_pool_lock = asyncio.Lock()
+# loop.time() before which get_pool() does not try to connect again
+_pool_retry_at = 0.0
+
+async def _ping_connection(conn):
+    # Warms new connections (init=) and, with DB_PRE_PING, checks them on acquire (setup=);
+    # a failure there makes asyncpg discard the connection and acquire_connection retries once
+    await conn.execute("SELECT 1")
+
+async def get_pool():
+    """Return the shared asyncpg pool, creating it on first use.
+    Returns None when DATABASE_URL is unset or the database is unreachable.
+    """
+    pool = getattr(app.state, "pool", None)
+    if pool is not None:
+        return pool
+    if not DATABASE_URL:
+        return None
+    global _pool_retry_at
+    loop = asyncio.get_running_loop()
+    if loop.time() < _pool_retry_at:
+        return None
+    async with _pool_lock:
+        if getattr(app.state, "pool", None) is None:
+            # Another request may have just failed while this one waited for the lock
+            if loop.time() < _pool_retry_at:
+                return None
+            try:
+                app.state.pool = await asyncpg.create_pool(
+                    DATABASE_URL,
+                    timeout=DB_CONNECT_TIMEOUT,
+                    min_size=DB_POOL_MIN_SIZE,
+                    max_size=DB_POOL_MAX_SIZE,
+                    max_inactive_connection_lifetime=300,
+                    command_timeout=60,
+                    statement_cache_size=DB_STATEMENT_CACHE_SIZE,
+                    max_cached_statement_lifetime=0,
+                    init=_ping_connection,
+                    setup=_ping_connection if DB_PRE_PING else None,
+                )
+            except Exception:
+                logger.exception("Could not open the database pool; retrying in %.0fs", DB_RETRY_BACKOFF)
+                _pool_retry_at = loop.time() + DB_RETRY_BACKOFF
+                return None
+    return app.state.pool
+
+# --- Batched persistence for triage_logs ---
+TRIAGE_LOG_COLUMNS = ["user_id", "language", "symptoms", "esi_level", "agent_responses"]
+LOG_FLUSH_INTERVAL = float(os.getenv("LOG_FLUSH_INTERVAL", 0.05))
+LOG_BATCH_MAX = 500
+LOG_QUEUE: asyncio.Queue = asyncio.Queue(maxsize=10000)
+TRIAGE_LOG_INSERT = (
+    f"INSERT INTO triage_logs ({', '.join(TRIAGE_LOG_COLUMNS)}) "
+    f"VALUES ({', '.join(f'${i}' for i in range(1, len(TRIAGE_LOG_COLUMNS) + 1))})"
+)
+
+async def _flush_triage_logs(batch: list) -> None:
+    """Write queued rows with one COPY instead of one INSERT round-trip per row."""
+    while len(batch) < LOG_BATCH_MAX:
+        try:
+            batch.append(LOG_QUEUE.get_nowait())
+        except asyncio.QueueEmpty:
+            break
+    if not batch:
+        return
+    pool = await get_pool()
+    if pool is None:
         return
     try:
-        conn = await asyncpg.connect(db_url)
+        async with pool.acquire(timeout=DB_ACQUIRE_TIMEOUT) as conn:
+            try:
+                await conn.copy_records_to_table("triage_logs", records=batch, columns=TRIAGE_LOG_COLUMNS)
+            except asyncpg.PostgresError:
+                # One bad row (e.g. too-long language, dangling user_id) fails the whole COPY;
+                # retry row by row so only the bad rows are lost
+                await _insert_triage_logs_individually(conn, batch)
     except Exception:
+        logger.exception("Dropped %d triage log rows", len(batch))
+
+async def _insert_triage_logs_individually(conn, batch: list) -> None:
+    for record in batch:
+        try:
+            await conn.execute(TRIAGE_LOG_INSERT, *record)
+        except asyncpg.PostgresError as e:
+            logger.warning("Dropped triage log row (user_id=%s, language=%r): %s", record[0], record[1], e)
+
+async def _log_flusher() -> None:
+    while True:
+        # Sleep only once something is queued, then drain whatever piled up meanwhile
+        first = await LOG_QUEUE.get()
+        try:
+            await asyncio.sleep(LOG_FLUSH_INTERVAL)
+        finally:
+            await _flush_triage_logs([first])
+
+@app.on_event("startup")
+async def open_db_pool():
+    # Open min_size connections up front so the first requests find them hot
+    await get_pool()
+    app.state.log_flusher = asyncio.create_task(_log_flusher())
+
+@app.on_event("shutdown")
+async def close_db_pool():
+    log_flusher = getattr(app.state, "log_flusher", None)
+    if log_flusher is not None:
+        log_flusher.cancel()
+        try:
+            await log_flusher
+        except asyncio.CancelledError:
+            pass
+    while not LOG_QUEUE.empty():
+        await _flush_triage_logs([])
+    pool = getattr(app.state, "pool", None)
+    if pool is not None:
+        app.state.pool = None
+        await pool.close()
+
+async def save_triage_log(*, user_id: int | None, language: str | None, symptoms: str, esi_level: int | None, agent_responses: dict):
+    """Queue a triage log row; the background flusher persists it in batches."""
+    if not DATABASE_URL:
         return
+    # Regex-heavy redaction runs in a worker thread, off the event loop
+    redacted = await asyncio.to_thread(redact_pii, symptoms) if symptoms else None
     try:
-        await conn.execute(
-            """
-            INSERT INTO triage_logs (user_id, language, symptoms, esi_level, agent_responses)
-            VALUES ($1, $2, $3, $4, $5)
-            """,
+        LOG_QUEUE.put_nowait((
             user_id,
             language,
-            redact_pii(symptoms) if symptoms else None,
+            redacted,
             esi_level if esi_level is not None else None,
-            json.dumps(agent_responses),
-        )
+            orjson.dumps(agent_responses).decode(),
+        ))
+    except asyncio.QueueFull:
+        pass  # best effort: never block the triage path on logging
+
+# Strong references to in-flight background tasks so they are not garbage collected
+BG_TASKS: set = set()
+
+async def _save_triage_log_quietly(**fields) -> None:
+    try:
+        await save_triage_log(**fields)
     except Exception:
         pass
-    finally:
-        await conn.close()
+
+def spawn_triage_log(**fields) -> None:
+    """Persist a triage log in the background; the response does not wait for it."""
+    task = asyncio.create_task(_save_triage_log_quietly(**fields))
+    BG_TASKS.add(task)
+    task.add_done_callback(BG_TASKS.discard)
 
 # --- WebSocket for agent orchestration ---
+WS_BATCH_MAX_BYTES = 64 * 1024
+# Once a result is ready, wait this long for more before sending the frame
+WS_BATCH_FLUSH_S = float(os.getenv("WS_BATCH_FLUSH_MS", 20)) / 1000
+# Messages processed concurrently per connection; reading pauses while this many are pending
+WS_MAX_IN_FLIGHT = int(os.getenv("WS_MAX_IN_FLIGHT", 8))
+
+async def _ws_sender(websocket: WebSocket, outq: asyncio.Queue) -> None:
+    """Send results in message order, one JSON-array frame per flush window.
+
+    ``outq`` holds one task per received message; a result is only batched
+    with the ones before it, so a slow message holds back those after it.
+    """
+    head = None
+    while True:
+        head = head or await outq.get()
+        parts = [orjson.dumps(await head)]
+        size = len(parts[0])
+        head = None
+        await asyncio.sleep(WS_BATCH_FLUSH_S)
+        while True:
+            if head is None:
+                try:
+                    head = outq.get_nowait()
+                except asyncio.QueueEmpty:
+                    break
+            if not head.done():
+                break
+            encoded = orjson.dumps(head.result())
+            head = None
+            if size + len(encoded) > WS_BATCH_MAX_BYTES:
+                # Flush before this frame grows too large; keep the item for the next one
+                await websocket.send_text((b"[" + b",".join(parts) + b"]").decode())
+                parts, size = [], 0
+            parts.append(encoded)
+            size += len(encoded)
+        # Text frames: the frontend JSON.parse()s event.data as a string
+        await websocket.send_text((b"[" + b",".join(parts) + b"]").decode())
+
+async def _ws_triage_message(data: dict) -> dict:
+    """Run the emergency flow for one WebSocket message; errors become result objects."""
+    audio_b64 = data.get("audio")
+    if not audio_b64:
+        return {"error": "No audio provided."}
+    try:
+        # Large clips decode in a worker thread so other connections keep flowing
+        audio_bytes = await asyncio.to_thread(base64.b64decode, audio_b64.split(",", 1)[-1])
+        result = await run_emergency_flow(audio_bytes)
+        # Persist triage log (best effort, non-blocking critical path)
+        try:
+            voice_text = result.get("voice", {}).get("text", "")
+            language = result.get("voice", {}).get("language", "en")
+            esi_level = result.get("triage", {}).get("esi_level")
+            spawn_triage_log(user_id=None, language=language, symptoms=voice_text, esi_level=esi_level, agent_responses=result)
+        except Exception:
+            pass
+        return result
+    except Exception as e:
+        return {"error": str(e)}
+
 @app.websocket("/ws/triage")
 async def ws_triage(websocket: WebSocket):
-    # Support both package (backend.agent_orchestrator) and script execution contexts
-    try:
-        from .agent_orchestrator import run_emergency_flow  # type: ignore
-    except ImportError:  # pragma: no cover
-        from agent_orchestrator import run_emergency_flow  # type: ignore
     await websocket.accept()
-    while True:
-        data = await websocket.receive_json()
-        import base64
-        audio_b64 = data.get("audio")
-        if not audio_b64:
-            await websocket.send_json({"error": "No audio provided."})
-            continue
-        try:
-            audio_bytes = base64.b64decode(audio_b64.split(",")[-1])
-            result = await run_emergency_flow(audio_bytes)
-            # Persist triage log (best effort, non-blocking critical path)
-            try:
-                voice_text = result.get("voice", {}).get("text", "")
-                language = result.get("voice", {}).get("language", "en")
-                esi_level = result.get("triage", {}).get("esi_level")
-                await save_triage_log(user_id=None, language=language, symptoms=voice_text, esi_level=esi_level, agent_responses=result)
-            except Exception:
-                pass
-            await websocket.send_json(result)
-        except Exception as e:
-            await websocket.send_json({"error": str(e)})
+    # Messages are processed concurrently; a per-connection sender returns their
+    # results in order, batching those that finish close together into JSON arrays
+    outq: asyncio.Queue = asyncio.Queue(maxsize=WS_MAX_IN_FLIGHT)
+    send_task = asyncio.create_task(_ws_sender(websocket, outq))
+    try:
+        while True:
+            data = await websocket.receive_json()
+            if send_task.done():
+                break  # the sender hit a closed socket; stop reading too
+            task = asyncio.create_task(_ws_triage_message(data))
+            # Held until done, so a flow still running at disconnect is not collected
+            BG_TASKS.add(task)
+            task.add_done_callback(BG_TASKS.discard)
+            await outq.put(task)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        send_task.cancel()
 
 
 # --- Production REST API endpoints ---
@@ -115,13 +348,26 @@ from typing import List, Optional
 import asyncpg
 
 # Database connection utility
+async def acquire_connection(pool):
+    """Check a connection out of ``pool``, retrying once; 503 if none can be had."""
+    for attempt in range(2):
+        try:
+            return await pool.acquire(timeout=DB_ACQUIRE_TIMEOUT)
+        except (asyncpg.PostgresConnectionError, asyncpg.InterfaceError, ConnectionError, asyncio.TimeoutError):
+            # The pre-ping found a dead connection (it was dropped, so take a fresh one),
+            # or the pool stayed exhausted for DB_ACQUIRE_TIMEOUT
+            if attempt:
+                raise HTTPException(status_code=503, detail="Database unavailable")
+
 async def get_db():
-    db_url = os.getenv("DATABASE_URL")
-    conn = await asyncpg.connect(db_url)
+    pool = await get_pool()
+    if pool is None:
+        raise HTTPException(status_code=503, detail="Database unavailable")
+    conn = await acquire_connection(pool)
     try:
         yield conn
     finally:
-        await conn.close()
+        await pool.release(conn)
 
 # --- Models ---
 class TriageRequest(BaseModel):
@@ -144,7 +390,7 @@ class UserBase(BaseModel):
     role: str
 
 class UserCreate(UserBase):
-    password_hash: str
+    password: str
 
 class User(UserBase):
     id: int
@@ -270,13 +516,7 @@ class AgentLog(AgentLogBase):
 # --- Triage endpoint ---
 @app.post("/api/triage")
 async def triage(request: TriageRequest):
-    # Support both package (backend.agent_orchestrator) and script execution contexts
-    try:
-        from .agent_orchestrator import run_emergency_flow  # type: ignore
-    except ImportError:  # pragma: no cover
-        from agent_orchestrator import run_emergency_flow  # type: ignore
     voice_result = {"text": request.symptoms, "language": request.language, "panic": False}
-    from agents import medical_triage_agent, translation_coordinator_agent, medical_office_triage_voice_agent, vital_signs_monitor_agent, insurance_verification_agent
     triage_result = await medical_triage_agent.analyze_symptoms(request.symptoms, language=request.language)
     translation = await translation_coordinator_agent.translate_medical(f"ESI Level: {triage_result['esi_level']}", request.language)
     history = {"history": "No audio provided."}
@@ -292,432 +532,317 @@ async def triage(request: TriageRequest):
         "dispatch": dispatch,
         "insurance": insurance
     }
-    # Persist REST triage as well (best effort)
-    try:
-        await save_triage_log(user_id=None, language=request.language, symptoms=request.symptoms, esi_level=triage_result.get("esi_level"), agent_responses=aggregated)
-    except Exception:
-        pass
+    # Persist REST triage as well (best effort, in the background)
+    spawn_triage_log(user_id=None, language=request.language, symptoms=request.symptoms, esi_level=triage_result.get("esi_level"), agent_responses=aggregated)
     return aggregated
 
+def rows_to_dicts(rows) -> list[dict]:
+    """Convert asyncpg records to dicts, reading the column names once per result set.
+
+    Used for every multi-row result; a single record is just ``dict(row)``.
+    """
+    if not rows:
+        return []
+    cols = tuple(rows[0].keys())
+    return [dict(zip(cols, row.values())) for row in rows]
+
 # --- Triage logs endpoints ---
-@app.get("/api/logs")
-async def get_logs():
-    import asyncpg
-    db_url = os.getenv("DATABASE_URL")
-    conn = await asyncpg.connect(db_url)
-    try:
-        rows = await conn.fetch("SELECT * FROM triage_logs ORDER BY created_at DESC LIMIT 100")
-        logs = [dict(row) for row in rows]
-        return {"logs": logs}
-    finally:
-        await conn.close()
+from fastapi import Query, Request
+from fastapi.responses import StreamingResponse
 
-@app.post("/api/logs")
-async def add_log(log: TriageLog):
-    import asyncpg
-    db_url = os.getenv("DATABASE_URL")
-    conn = await asyncpg.connect(db_url)
-    try:
-        await conn.execute(
-            """
-            INSERT INTO triage_logs (user_id, language, symptoms, esi_level, agent_responses)
-            VALUES ($1, $2, $3, $4, $5)
-            """,
-            log.user_id, log.language, log.symptoms, log.esi_level, log.agent_responses
-        )
-        return {"status": "ok"}
-    finally:
-        await conn.close()
+LOGS_CURSOR_PREFETCH = 200
+LOGS_SQL = "SELECT * FROM triage_logs ORDER BY created_at DESC LIMIT $1"
+
+@app.get("/api/logs")
+async def get_logs(request: Request, limit: int = Query(100, ge=1, le=10000)):
+    """Stream the newest triage logs straight from a server-side cursor.
+
+    Memory stays flat regardless of ``limit``. The body is the usual
+    ``{"logs": [...]}`` document, or one JSON object per line when the
+    client sends ``Accept: application/x-ndjson``.
+    """
+    pool = await get_pool()
+    if pool is None:
+        raise HTTPException(status_code=503, detail="Database unavailable")
+    ndjson = "application/x-ndjson" in request.headers.get("accept", "")
+
+    # Check out the connection, open the cursor and read the first page before
+    # responding: once StreamingResponse starts, the 200 and headers are already sent
+    db = await acquire_connection(pool)
+    tx = db.transaction()  # cursors only live inside a transaction
+
+    async def release() -> None:
+        try:
+            if db.is_in_transaction():
+                await tx.rollback()  # read-only; nothing to commit
+        except Exception:
+            pass
+        finally:
+            await pool.release(db)
 
-# --- Protocols endpoint ---
-@app.get("/api/protocols")
-async def get_protocols():
-    import asyncpg
-    db_url = os.getenv("DATABASE_URL")
-    conn = await asyncpg.connect(db_url)
     try:
-        rows = await conn.fetch("SELECT id, name, description, steps FROM protocols ORDER BY id")
-        protocols = [dict(row) for row in rows]
-        return {"protocols": protocols}
-    finally:
-        await conn.close()
+        await tx.start()
+        cursor = await db.cursor(LOGS_SQL, limit)
+        rows = await cursor.fetch(LOGS_CURSOR_PREFETCH)
+    except Exception:
+        await release()
+        logger.exception("Could not read triage logs")
+        raise HTTPException(status_code=503, detail="Database unavailable")
 
-# --- Users CRUD endpoints ---
-from fastapi import Path
+    async def stream(rows):
+        # The connection stays checked out until the last chunk has been sent
+        try:
+            if not ndjson:
+                yield b'{"logs":['
+            sep = b""
+            while rows:
+                for log in rows_to_dicts(rows):
+                    if ndjson:
+                        yield orjson.dumps(log) + b"\n"
+                    else:
+                        yield sep + orjson.dumps(log)
+                        sep = b","
+                rows = await cursor.fetch(LOGS_CURSOR_PREFETCH)
+            if not ndjson:
+                yield b"]}"
+        finally:
+            await release()
+
+    return StreamingResponse(stream(rows), media_type="application/x-ndjson" if ndjson else "application/json")
 
-@app.post("/api/users", response_model=User)
-async def create_user(user: UserCreate, db=Depends(get_db)):
-    row = await db.fetchrow(
-        """
-        INSERT INTO users (username, password_hash, email, role)
-        VALUES ($1, $2, $3, $4)
-        RETURNING id, username, email, role, created_at
-        """,
-        user.username, user.password_hash, user.email, user.role
-    )
-    return User(**row)
-
-@app.get("/api/users", response_model=List[User])
-async def list_users(db=Depends(get_db)):
-    rows = await db.fetch("SELECT id, username, email, role, created_at FROM users ORDER BY id")
-    return [User(**row) for row in rows]
-
-@app.get("/api/users/{user_id}", response_model=User)
-async def get_user(user_id: int = Path(..., gt=0), db=Depends(get_db)):
-    row = await db.fetchrow("SELECT id, username, email, role, created_at FROM users WHERE id=$1", user_id)
-    if not row:
-        raise HTTPException(status_code=404, detail="User not found")
-    return User(**row)
-
-@app.put("/api/users/{user_id}", response_model=User)
-async def update_user(user_id: int, user: UserCreate, db=Depends(get_db)):
-    row = await db.fetchrow(
-        """
-        UPDATE users SET username=$1, password_hash=$2, email=$3, role=$4
-        WHERE id=$5 RETURNING id, username, email, role, created_at
-        """,
-        user.username, user.password_hash, user.email, user.role, user_id
-    )
-    if not row:
-        raise HTTPException(status_code=404, detail="User not found")
-    return User(**row)
-
-@app.delete("/api/users/{user_id}")
-async def delete_user(user_id: int, db=Depends(get_db)):
-    result = await db.execute("DELETE FROM users WHERE id=$1", user_id)
-    if result == "DELETE 0":
-        raise HTTPException(status_code=404, detail="User not found")
-    return {"ok": True}
-
-# --- Patients CRUD endpoints ---
-@app.post("/api/patients", response_model=Patient)
-async def create_patient(patient: PatientCreate, db=Depends(get_db)):
-    row = await db.fetchrow(
-        """
-        INSERT INTO patients (first_name, last_name, date_of_birth, gender, phone, email, address, emergency_contact_name, emergency_contact_phone)
-        VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9)
-        RETURNING id, first_name, last_name, date_of_birth, gender, phone, email, address, emergency_contact_name, emergency_contact_phone, created_at
-        """,
-        patient.first_name, patient.last_name, patient.date_of_birth, patient.gender, patient.phone, patient.email, patient.address, patient.emergency_contact_name, patient.emergency_contact_phone
-    )
-    return Patient(**row)
-
-@app.get("/api/patients", response_model=List[Patient])
-async def list_patients(db=Depends(get_db)):
-    rows = await db.fetch("SELECT id, first_name, last_name, date_of_birth, gender, phone, email, address, emergency_contact_name, emergency_contact_phone, created_at FROM patients ORDER BY id")
-    return [Patient(**row) for row in rows]
-
-@app.get("/api/patients/{patient_id}", response_model=Patient)
-async def get_patient(patient_id: int = Path(..., gt=0), db=Depends(get_db)):
-    row = await db.fetchrow("SELECT id, first_name, last_name, date_of_birth, gender, phone, email, address, emergency_contact_name, emergency_contact_phone, created_at FROM patients WHERE id=$1", patient_id)
-    if not row:
-        raise HTTPException(status_code=404, detail="Patient not found")
-    return Patient(**row)
-
-@app.put("/api/patients/{patient_id}", response_model=Patient)
-async def update_patient(patient_id: int, patient: PatientCreate, db=Depends(get_db)):
-    row = await db.fetchrow(
-        """
-        UPDATE patients SET first_name=$1, last_name=$2, date_of_birth=$3, gender=$4, phone=$5, email=$6, address=$7, emergency_contact_name=$8, emergency_contact_phone=$9
-        WHERE id=$10 RETURNING id, first_name, last_name, date_of_birth, gender, phone, email, address, emergency_contact_name, emergency_contact_phone, created_at
-        """,
-        patient.first_name, patient.last_name, patient.date_of_birth, patient.gender, patient.phone, patient.email, patient.address, patient.emergency_contact_name, patient.emergency_contact_phone, patient_id
-    )
-    if not row:
-        raise HTTPException(status_code=404, detail="Patient not found")
-    return Patient(**row)
-
-@app.delete("/api/patients/{patient_id}")
-async def delete_patient(patient_id: int, db=Depends(get_db)):
-    result = await db.execute("DELETE FROM patients WHERE id=$1", patient_id)
-    if result == "DELETE 0":
-        raise HTTPException(status_code=404, detail="Patient not found")
-    return {"ok": True}
-
-# --- Medical Staff CRUD endpoints ---
-@app.post("/api/medical_staff", response_model=MedicalStaff)
-async def create_medical_staff(staff: MedicalStaffCreate, db=Depends(get_db)):
-    row = await db.fetchrow(
-        """
-        INSERT INTO medical_staff (user_id, staff_type, license_number, department)
-        VALUES ($1, $2, $3, $4)
-        RETURNING id, user_id, staff_type, license_number, department, created_at
-        """,
-        staff.user_id, staff.staff_type, staff.license_number, staff.department
-    )
-    return MedicalStaff(**row)
-
-@app.get("/api/medical_staff", response_model=List[MedicalStaff])
-async def list_medical_staff(db=Depends(get_db)):
-    rows = await db.fetch("SELECT id, user_id, staff_type, license_number, department, created_at FROM medical_staff ORDER BY id")
-    return [MedicalStaff(**row) for row in rows]
-
-@app.get("/api/medical_staff/{staff_id}", response_model=MedicalStaff)
-async def get_medical_staff(staff_id: int = Path(..., gt=0), db=Depends(get_db)):
-    row = await db.fetchrow("SELECT id, user_id, staff_type, license_number, department, created_at FROM medical_staff WHERE id=$1", staff_id)
-    if not row:
-        raise HTTPException(status_code=404, detail="Medical staff not found")
-    return MedicalStaff(**row)
-
-@app.put("/api/medical_staff/{staff_id}", response_model=MedicalStaff)
-async def update_medical_staff(staff_id: int, staff: MedicalStaffCreate, db=Depends(get_db)):
-    row = await db.fetchrow(
-        """
-        UPDATE medical_staff SET user_id=$1, staff_type=$2, license_number=$3, department=$4
-        WHERE id=$5 RETURNING id, user_id, staff_type, license_number, department, created_at
-        """,
-        staff.user_id, staff.staff_type, staff.license_number, staff.department, staff_id
-    )
-    if not row:
-        raise HTTPException(status_code=404, detail="Medical staff not found")
-    return MedicalStaff(**row)
-
-@app.delete("/api/medical_staff/{staff_id}")
-async def delete_medical_staff(staff_id: int, db=Depends(get_db)):
-    result = await db.execute("DELETE FROM medical_staff WHERE id=$1", staff_id)
-    if result == "DELETE 0":
-        raise HTTPException(status_code=404, detail="Medical staff not found")
-    return {"ok": True}
-
-# --- Insurance CRUD endpoints ---
-@app.post("/api/insurance", response_model=Insurance)
-async def create_insurance(insurance: InsuranceCreate, db=Depends(get_db)):
-    row = await db.fetchrow(
-        """
-        INSERT INTO insurance (patient_id, provider, policy_number, valid_until)
-        VALUES ($1, $2, $3, $4)
-        RETURNING id, patient_id, provider, policy_number, valid_until, created_at
-        """,
-        insurance.patient_id, insurance.provider, insurance.policy_number, insurance.valid_until
-    )
-    return Insurance(**row)
-
-@app.get("/api/insurance", response_model=List[Insurance])
-async def list_insurance(db=Depends(get_db)):
-    rows = await db.fetch("SELECT id, patient_id, provider, policy_number, valid_until, created_at FROM insurance ORDER BY id")
-    return [Insurance(**row) for row in rows]
-
-@app.get("/api/insurance/{insurance_id}", response_model=Insurance)
-async def get_insurance(insurance_id: int = Path(..., gt=0), db=Depends(get_db)):
-    row = await db.fetchrow("SELECT id, patient_id, provider, policy_number, valid_until, created_at FROM insurance WHERE id=$1", insurance_id)
-    if not row:
-        raise HTTPException(status_code=404, detail="Insurance not found")
-    return Insurance(**row)
-
-@app.put("/api/insurance/{insurance_id}", response_model=Insurance)
-async def update_insurance(insurance_id: int, insurance: InsuranceCreate, db=Depends(get_db)):
-    row = await db.fetchrow(
-        """
-        UPDATE insurance SET patient_id=$1, provider=$2, policy_number=$3, valid_until=$4
-        WHERE id=$5 RETURNING id, patient_id, provider, policy_number, valid_until, created_at
-        """,
-        insurance.patient_id, insurance.provider, insurance.policy_number, insurance.valid_until, insurance_id
-    )
-    if not row:
-        raise HTTPException(status_code=404, detail="Insurance not found")
-    return Insurance(**row)
-
-@app.delete("/api/insurance/{insurance_id}")
-async def delete_insurance(insurance_id: int, db=Depends(get_db)):
-    result = await db.execute("DELETE FROM insurance WHERE id=$1", insurance_id)
-    if result == "DELETE 0":
-        raise HTTPException(status_code=404, detail="Insurance not found")
-    return {"ok": True}
-
-# --- Triage Records CRUD endpoints ---
-@app.post("/api/triage_records", response_model=TriageRecord)
-async def create_triage_record(record: TriageRecordCreate, db=Depends(get_db)):
-    row = await db.fetchrow(
-        """
-        INSERT INTO triage_records (patient_id, staff_id, chief_complaint, triage_level, notes)
-        VALUES ($1, $2, $3, $4, $5)
-        RETURNING id, patient_id, staff_id, triage_time, chief_complaint, triage_level, notes
-        """,
-        record.patient_id, record.staff_id, record.chief_complaint, record.triage_level, record.notes
-    )
-    return TriageRecord(**row)
-
-@app.get("/api/triage_records", response_model=List[TriageRecord])
-async def list_triage_records(db=Depends(get_db)):
-    rows = await db.fetch("SELECT id, patient_id, staff_id, triage_time, chief_complaint, triage_level, notes FROM triage_records ORDER BY id")
-    return [TriageRecord(**row) for row in rows]
-
-@app.get("/api/triage_records/{record_id}", response_model=TriageRecord)
-async def get_triage_record(record_id: int = Path(..., gt=0), db=Depends(get_db)):
-    row = await db.fetchrow("SELECT id, patient_id, staff_id, triage_time, chief_complaint, triage_level, notes FROM triage_records WHERE id=$1", record_id)
-    if not row:
-        raise HTTPException(status_code=404, detail="Triage record not found")
-    return TriageRecord(**row)
-
-@app.put("/api/triage_records/{record_id}", response_model=TriageRecord)
-async def update_triage_record(record_id: int, record: TriageRecordCreate, db=Depends(get_db)):
-    row = await db.fetchrow(
-        """
-        UPDATE triage_records SET patient_id=$1, staff_id=$2, chief_complaint=$3, triage_level=$4, notes=$5
-        WHERE id=$6 RETURNING id, patient_id, staff_id, triage_time, chief_complaint, triage_level, notes
-        """,
-        record.patient_id, record.staff_id, record.chief_complaint, record.triage_level, record.notes, record_id
-    )
-    if not row:
-        raise HTTPException(status_code=404, detail="Triage record not found")
-    return TriageRecord(**row)
-
-@app.delete("/api/triage_records/{record_id}")
-async def delete_triage_record(record_id: int, db=Depends(get_db)):
-    result = await db.execute("DELETE FROM triage_records WHERE id=$1", record_id)
-    if result == "DELETE 0":
-        raise HTTPException(status_code=404, detail="Triage record not found")
-    return {"ok": True}
-
-# --- Vital Signs CRUD endpoints ---
-@app.post("/api/vital_signs", response_model=VitalSign)
-async def create_vital_sign(vital: VitalSignCreate, db=Depends(get_db)):
-    row = await db.fetchrow(
-        """
-        INSERT INTO vital_signs (triage_record_id, heart_rate, blood_pressure_systolic, blood_pressure_diastolic, respiratory_rate, spo2, temperature_c, stress_level)
-        VALUES ($1, $2, $3, $4, $5, $6, $7, $8)
-        RETURNING id, triage_record_id, heart_rate, blood_pressure_systolic, blood_pressure_diastolic, respiratory_rate, spo2, temperature_c, stress_level, measured_at
-        """,
-        vital.triage_record_id, vital.heart_rate, vital.blood_pressure_systolic, vital.blood_pressure_diastolic, vital.respiratory_rate, vital.spo2, vital.temperature_c, vital.stress_level
-    )
-    return VitalSign(**row)
-
-@app.get("/api/vital_signs", response_model=List[VitalSign])
-async def list_vital_signs(db=Depends(get_db)):
-    rows = await db.fetch("SELECT id, triage_record_id, heart_rate, blood_pressure_systolic, blood_pressure_diastolic, respiratory_rate, spo2, temperature_c, stress_level, measured_at FROM vital_signs ORDER BY id")
-    return [VitalSign(**row) for row in rows]
-
-@app.get("/api/vital_signs/{vital_id}", response_model=VitalSign)
-async def get_vital_sign(vital_id: int = Path(..., gt=0), db=Depends(get_db)):
-    row = await db.fetchrow("SELECT id, triage_record_id, heart_rate, blood_pressure_systolic, blood_pressure_diastolic, respiratory_rate, spo2, temperature_c, stress_level, measured_at FROM vital_signs WHERE id=$1", vital_id)
-    if not row:
-        raise HTTPException(status_code=404, detail="Vital sign not found")
-    return VitalSign(**row)
-
-@app.put("/api/vital_signs/{vital_id}", response_model=VitalSign)
-async def update_vital_sign(vital_id: int, vital: VitalSignCreate, db=Depends(get_db)):
-    row = await db.fetchrow(
-        """
-        UPDATE vital_signs SET triage_record_id=$1, heart_rate=$2, blood_pressure_systolic=$3, blood_pressure_diastolic=$4, respiratory_rate=$5, spo2=$6, temperature_c=$7, stress_level=$8
-        WHERE id=$9 RETURNING id, triage_record_id, heart_rate, blood_pressure_systolic, blood_pressure_diastolic, respiratory_rate, spo2, temperature_c, stress_level, measured_at
-        """,
-        vital.triage_record_id, vital.heart_rate, vital.blood_pressure_systolic, vital.blood_pressure_diastolic, vital.respiratory_rate, vital.spo2, vital.temperature_c, vital.stress_level, vital_id
-    )
-    if not row:
-        raise HTTPException(status_code=404, detail="Vital sign not found")
-    return VitalSign(**row)
-
-@app.delete("/api/vital_signs/{vital_id}")
-async def delete_vital_sign(vital_id: int, db=Depends(get_db)):
-    result = await db.execute("DELETE FROM vital_signs WHERE id=$1", vital_id)
-    if result == "DELETE 0":
-        raise HTTPException(status_code=404, detail="Vital sign not found")
-    return {"ok": True}
-
-# --- Audit Logs CRUD endpoints ---
-@app.post("/api/audit_logs", response_model=AuditLog)
-async def create_audit_log(log: AuditLogCreate, db=Depends(get_db)):
-    row = await db.fetchrow(
-        """
-        INSERT INTO audit_logs (user_id, action, details)
-        VALUES ($1, $2, $3)
-        RETURNING id, user_id, action, details, created_at
-        """,
-        log.user_id, log.action, log.details
-    )
-    return AuditLog(**row)
-
-@app.get("/api/audit_logs", response_model=List[AuditLog])
-async def list_audit_logs(db=Depends(get_db)):
-    rows = await db.fetch("SELECT id, user_id, action, details, created_at FROM audit_logs ORDER BY id")
-    return [AuditLog(**row) for row in rows]
-
-@app.get("/api/audit_logs/{log_id}", response_model=AuditLog)
-async def get_audit_log(log_id: int = Path(..., gt=0), db=Depends(get_db)):
-    row = await db.fetchrow("SELECT id, user_id, action, details, created_at FROM audit_logs WHERE id=$1", log_id)
-    if not row:
-        raise HTTPException(status_code=404, detail="Audit log not found")
-    return AuditLog(**row)
-
-@app.put("/api/audit_logs/{log_id}", response_model=AuditLog)
-async def update_audit_log(log_id: int, log: AuditLogCreate, db=Depends(get_db)):
-    row = await db.fetchrow(
-        """
-        UPDATE audit_logs SET user_id=$1, action=$2, details=$3
-        WHERE id=$4 RETURNING id, user_id, action, details, created_at
-        """,
-        log.user_id, log.action, log.details, log_id
-    )
-    if not row:
-        raise HTTPException(status_code=404, detail="Audit log not found")
-    return AuditLog(**row)
-
-@app.delete("/api/audit_logs/{log_id}")
-async def delete_audit_log(log_id: int, db=Depends(get_db)):
-    result = await db.execute("DELETE FROM audit_logs WHERE id=$1", log_id)
-    if result == "DELETE 0":
-        raise HTTPException(status_code=404, detail="Audit log not found")
-    return {"ok": True}
-
-# --- Agent Logs CRUD endpoints ---
-@app.post("/api/agent_logs", response_model=AgentLog)
-async def create_agent_log(log: AgentLogCreate, db=Depends(get_db)):
-    row = await db.fetchrow(
+@app.post("/api/logs")
+async def add_log(log: TriageLog, db=Depends(get_db)):
+    await db.execute(
         """
-        INSERT INTO agent_logs (agent_name, user_id, patient_id, action, message)
+        INSERT INTO triage_logs (user_id, language, symptoms, esi_level, agent_responses)
         VALUES ($1, $2, $3, $4, $5)
-        RETURNING id, agent_name, user_id, patient_id, action, message, created_at
-        """,
-        log.agent_name, log.user_id, log.patient_id, log.action, log.message
-    )
-    return AgentLog(**row)
-
-@app.get("/api/agent_logs", response_model=List[AgentLog])
-async def list_agent_logs(db=Depends(get_db)):
-    rows = await db.fetch("SELECT id, agent_name, user_id, patient_id, action, message, created_at FROM agent_logs ORDER BY id")
-    return [AgentLog(**row) for row in rows]
-
-@app.get("/api/agent_logs/{log_id}", response_model=AgentLog)
-async def get_agent_log(log_id: int = Path(..., gt=0), db=Depends(get_db)):
-    row = await db.fetchrow("SELECT id, agent_name, user_id, patient_id, action, message, created_at FROM agent_logs WHERE id=$1", log_id)
-    if not row:
-        raise HTTPException(status_code=404, detail="Agent log not found")
-    return AgentLog(**row)
-
-@app.put("/api/agent_logs/{log_id}", response_model=AgentLog)
-async def update_agent_log(log_id: int, log: AgentLogCreate, db=Depends(get_db)):
-    row = await db.fetchrow(
-        """
-        UPDATE agent_logs SET agent_name=$1, user_id=$2, patient_id=$3, action=$4, message=$5
-        WHERE id=$6 RETURNING id, agent_name, user_id, patient_id, action, message, created_at
         """,
-        log.agent_name, log.user_id, log.patient_id, log.action, log.message, log_id
+        log.user_id, log.language, log.symptoms, log.esi_level, log.agent_responses
     )
-    if not row:
-        raise HTTPException(status_code=404, detail="Agent log not found")
-    return AgentLog(**row)
+    return {"status": "ok"}
 
-@app.delete("/api/agent_logs/{log_id}")
-async def delete_agent_log(log_id: int, db=Depends(get_db)):
-    result = await db.execute("DELETE FROM agent_logs WHERE id=$1", log_id)
-    if result == "DELETE 0":
-        raise HTTPException(status_code=404, detail="Agent log not found")
-    return {"ok": True}
+# --- Protocols endpoint ---
+import hashlib
+import time
+from fastapi import Response
+
+# Protocols are read-mostly reference data: serve them from memory with an ETag
+PROTOCOLS_CACHE_TTL = float(os.getenv("PROTOCOLS_CACHE_TTL", 60))
+# (loaded_at, encoded body, etag)
+_PROTOCOL_CACHE: tuple[float, bytes, str] | None = None
+
+def invalidate_protocols_cache() -> None:
+    """Drop the cached protocol list; call after anything that writes to protocols."""
+    global _PROTOCOL_CACHE
+    _PROTOCOL_CACHE = None
+
+async def _load_protocols() -> tuple[float, bytes, str]:
+    global _PROTOCOL_CACHE
+    cached = _PROTOCOL_CACHE
+    if cached is not None and time.monotonic() - cached[0] < PROTOCOLS_CACHE_TTL:
+        return cached
+    pool = await get_pool()
+    if pool is None:
+        raise HTTPException(status_code=503, detail="Database unavailable")
+    async with pool.acquire(timeout=DB_ACQUIRE_TIMEOUT) as db:
+        rows = await db.fetch("SELECT id, name, description, steps FROM protocols ORDER BY id")
+    body = orjson.dumps({"protocols": rows_to_dicts(rows)})
+    etag = '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+    _PROTOCOL_CACHE = (time.monotonic(), body, etag)
+    return _PROTOCOL_CACHE
+
+@app.get("/api/protocols")
+async def get_protocols(request: Request):
+    _, body, etag = await _load_protocols()
+    headers = {"ETag": etag, "Cache-Control": f"public, max-age={int(PROTOCOLS_CACHE_TTL)}"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+# --- Generic CRUD endpoints ---
+from fastapi import Body, Path
+
+# Largest accepted /bulk payload; bigger imports must be split into several requests
+BULK_MAX_ITEMS = int(os.getenv("BULK_MAX_ITEMS", 1000))
+
+def _field_values(columns: tuple[str, ...]):
+    async def values(item) -> tuple:
+        return tuple(getattr(item, col) for col in columns)
+    return values
+
+async def _user_values(user: UserCreate) -> tuple:
+    return (user.username, await hash_password(user.password), user.email, user.role)
+
+def register_crud(
+    resource: str,
+    *,
+    model: type[BaseModel],
+    create_model: type[BaseModel],
+    columns: tuple[str, ...],
+    returning: tuple[str, ...],
+    id_param: str,
+    label: str,
+    singular: str,
+    bulk: bool = False,
+    values=None,
+) -> None:
+    """Register list/get/create/update/delete (and optionally bulk) routes for one table.
+
+    SQL is built once here from trusted identifiers, so every handler reuses the
+    same handful of statements. ``values`` maps a create payload to the column
+    values (async, e.g. to hash a password); it defaults to reading ``columns``
+    off the payload. List endpoints use keyset pagination: pass the last id seen
+    as ``after_id``. Handlers return plain row dicts; FastAPI validates them once
+    against ``model``.
+    """
+    table = resource
+    values = values or _field_values(columns)
+    out = ", ".join(returning)
+    placeholders = ", ".join(f"${i}" for i in range(1, len(columns) + 1))
+    assignments = ", ".join(f"{col}=${i}" for i, col in enumerate(columns, 1))
+    insert_sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders}) RETURNING {out}"
+    bulk_sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})"
+    list_sql = f"SELECT {out} FROM {table} WHERE id > $1 ORDER BY id LIMIT $2"
+    get_sql = f"SELECT {out} FROM {table} WHERE id=$1"
+    update_sql = f"UPDATE {table} SET {assignments} WHERE id=${len(columns) + 1} RETURNING {out}"
+    delete_sql = f"DELETE FROM {table} WHERE id=$1"
+    not_found = f"{label} not found"
+    base = f"/api/{resource}"
+    item_path = f"{base}/{{{id_param}}}"
+
+    async def create(item: create_model, db=Depends(get_db)):
+        row = await db.fetchrow(insert_sql, *await values(item))
+        return dict(row)
+
+    async def create_bulk(items: List[create_model] = Body(..., max_length=BULK_MAX_ITEMS), db=Depends(get_db)):
+        # One pipelined executemany instead of one round-trip per row
+        rows = await asyncio.gather(*(values(item) for item in items))
+        await db.executemany(bulk_sql, rows)
+        return {"inserted": len(items)}
+
+    async def list_items(limit: int = Query(100, ge=1, le=1000), after_id: int = 0, db=Depends(get_db)):
+        rows = await db.fetch(list_sql, after_id, limit)
+        return rows_to_dicts(rows)
+
+    async def get_item(item_id: int = Path(..., gt=0, alias=id_param), db=Depends(get_db)):
+        row = await db.fetchrow(get_sql, item_id)
+        if not row:
+            raise HTTPException(status_code=404, detail=not_found)
+        return dict(row)
+
+    async def update_item(item: create_model, item_id: int = Path(..., alias=id_param), db=Depends(get_db)):
+        row = await db.fetchrow(update_sql, *await values(item), item_id)
+        if not row:
+            raise HTTPException(status_code=404, detail=not_found)
+        return dict(row)
+
+    async def delete_item(item_id: int = Path(..., alias=id_param), db=Depends(get_db)):
+        result = await db.execute(delete_sql, item_id)
+        if result == "DELETE 0":
+            raise HTTPException(status_code=404, detail=not_found)
+        return {"ok": True}
+
+    app.add_api_route(base, create, methods=["POST"], response_model=model, name=f"create_{singular}")
+    if bulk:
+        app.add_api_route(f"{base}/bulk", create_bulk, methods=["POST"], name=f"create_{resource}_bulk")
+    app.add_api_route(base, list_items, methods=["GET"], response_model=List[model], name=f"list_{resource}")
+    app.add_api_route(item_path, get_item, methods=["GET"], response_model=model, name=f"get_{singular}")
+    app.add_api_route(item_path, update_item, methods=["PUT"], response_model=model, name=f"update_{singular}")
+    app.add_api_route(item_path, delete_item, methods=["DELETE"], name=f"delete_{singular}")
+
+register_crud(
+    "users", model=User, create_model=UserCreate,
+    columns=("username", "password_hash", "email", "role"),
+    returning=("id", "username", "email", "role", "created_at"),
+    id_param="user_id", label="User", singular="user", bulk=True, values=_user_values,
+)
+register_crud(
+    "patients", model=Patient, create_model=PatientCreate,
+    columns=("first_name", "last_name", "date_of_birth", "gender", "phone", "email", "address", "emergency_contact_name", "emergency_contact_phone"),
+    returning=("id", "first_name", "last_name", "date_of_birth", "gender", "phone", "email", "address", "emergency_contact_name", "emergency_contact_phone", "created_at"),
+    id_param="patient_id", label="Patient", singular="patient", bulk=True,
+)
+register_crud(
+    "medical_staff", model=MedicalStaff, create_model=MedicalStaffCreate,
+    columns=("user_id", "staff_type", "license_number", "department"),
+    returning=("id", "user_id", "staff_type", "license_number", "department", "created_at"),
+    id_param="staff_id", label="Medical staff", singular="medical_staff",
+)
+register_crud(
+    "insurance", model=Insurance, create_model=InsuranceCreate,
+    columns=("patient_id", "provider", "policy_number", "valid_until"),
+    returning=("id", "patient_id", "provider", "policy_number", "valid_until", "created_at"),
+    id_param="insurance_id", label="Insurance", singular="insurance", bulk=True,
+)
+register_crud(
+    "triage_records", model=TriageRecord, create_model=TriageRecordCreate,
+    columns=("patient_id", "staff_id", "chief_complaint", "triage_level", "notes"),
+    returning=("id", "patient_id", "staff_id", "triage_time", "chief_complaint", "triage_level", "notes"),
+    id_param="record_id", label="Triage record", singular="triage_record",
+)
+register_crud(
+    "vital_signs", model=VitalSign, create_model=VitalSignCreate,
+    columns=("triage_record_id", "heart_rate", "blood_pressure_systolic", "blood_pressure_diastolic", "respiratory_rate", "spo2", "temperature_c", "stress_level"),
+    returning=("id", "triage_record_id", "heart_rate", "blood_pressure_systolic", "blood_pressure_diastolic", "respiratory_rate", "spo2", "temperature_c", "stress_level", "measured_at"),
+    id_param="vital_id", label="Vital sign", singular="vital_sign", bulk=True,
+)
+register_crud(
+    "audit_logs", model=AuditLog, create_model=AuditLogCreate,
+    columns=("user_id", "action", "details"),
+    returning=("id", "user_id", "action", "details", "created_at"),
+    id_param="log_id", label="Audit log", singular="audit_log", bulk=True,
+)
+register_crud(
+    "agent_logs", model=AgentLog, create_model=AgentLogCreate,
+    columns=("agent_name", "user_id", "patient_id", "action", "message"),
+    returning=("id", "agent_name", "user_id", "patient_id", "action", "message", "created_at"),
+    id_param="log_id", label="Agent log", singular="agent_log", bulk=True,
+)
 
 # --- Mock ML API endpoint for vital sign analysis (free, local) ---
 from fastapi import UploadFile, File
-import random
+import numpy as np
+
+# Per-process generator; draws happen in C and vectorize over batches
+RNG = np.random.default_rng()
+STRESS_LEVELS = np.array(["low", "medium", "high"])
 
 @app.post("/mock-ml-api")
 async def mock_ml_api(file: UploadFile = File(...)):
     # Simulate analysis: return random or fixed values
-    stress_levels = ["low", "medium", "high"]
     return {
-        "stress_level": random.choice(stress_levels),
-        "heart_rate": random.randint(60, 100)
+        "stress_level": str(RNG.choice(STRESS_LEVELS)),
+        "heart_rate": int(RNG.integers(60, 101))
+    }
+
+@app.post("/mock-ml-api/batch")
+async def mock_ml_api_batch(files: List[UploadFile] = File(...)):
+    # One vectorized draw for the whole batch, like a real batched model call
+    n = len(files)
+    stress_levels = RNG.choice(STRESS_LEVELS, size=n).tolist()
+    heart_rates = RNG.integers(60, 101, size=n).tolist()
+    return {
+        "results": [
+            {"stress_level": level, "heart_rate": rate}
+            for level, rate in zip(stress_levels, heart_rates)
+        ]
     }
 
 # Added fallback runner so `python main.py` works if used outside Dockerfile CMD
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run("main:app", host="0.0.0.0", port=int(os.getenv("PORT", 8000)))
+    from ws_protocol import TunedWebSocketProtocol
+    uvicorn.run(
+        "main:app",
+        host="0.0.0.0",
+        port=int(os.getenv("PORT", 8000)),
+        # C-backed event loop and HTTP parser
+        loop="uvloop",
+        http="httptools",
+        # websockets protocol with TCP_NODELAY and a larger send buffer per connection
+        ws=TunedWebSocketProtocol,
+        # Largest accepted inbound frame (base64 audio clips)
+        ws_max_size=int(os.getenv("WS_MAX_SIZE", 16 * 1024 * 1024)),
+        # Each worker holds its own DB pool; see DB_MAX_CONNECTIONS
+        workers=WEB_CONCURRENCY,
+    )
@@ -4,3 +4,118 @@ ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
 if ROOT not in sys.path:
     sys.path.insert(0, ROOT)
 
+
+import pytest
+
+
+class FakeCursor:
+    def __init__(self, pages):
+        self.pages = list(pages)
+
+    async def fetch(self, n):
+        return self.pages.pop(0) if self.pages else []
+
+
+class FakeTransaction:
+    async def start(self):
+        pass
+
+    async def rollback(self):
+        pass
+
+
+class FakeConnection:
+    """Stands in for an asyncpg connection.
+
+    Every call is recorded in ``calls`` as ``(method, sql, args)``. A handler
+    registered with ``on(method, fn)`` is called with the same arguments and
+    supplies the result (or raises); without one, the call returns None.
+    ``pages`` are the batches a cursor hands out.
+    """
+
+    def __init__(self):
+        self.calls = []
+        self.handlers = {}
+        self.pages = []
+
+    def on(self, method, handler):
+        self.handlers[method] = handler
+
+    def _call(self, method, sql, *args):
+        self.calls.append((method, sql, args))
+        handler = self.handlers.get(method)
+        return handler(sql, *args) if handler else None
+
+    async def fetchrow(self, sql, *args):
+        return self._call("fetchrow", sql, *args)
+
+    async def fetch(self, sql, *args):
+        return self._call("fetch", sql, *args) or []
+
+    async def execute(self, sql, *args):
+        return self._call("execute", sql, *args)
+
+    async def executemany(self, sql, rows):
+        return self._call("executemany", sql, rows)
+
+    async def copy_records_to_table(self, table, *, records, columns):
+        return self._call("copy_records_to_table", table, records, columns)
+
+    def transaction(self):
+        return FakeTransaction()
+
+    def is_in_transaction(self):
+        return True
+
+    async def cursor(self, sql, *args):
+        self._call("cursor", sql, *args)
+        return FakeCursor(self.pages)
+
+
+class _FakeAcquire:
+    # Like asyncpg's PoolAcquireContext: usable with both ``await`` and ``async with``
+    def __init__(self, pool):
+        self.pool = pool
+
+    async def _acquire(self):
+        if self.pool.acquire_error is not None:
+            raise self.pool.acquire_error
+        return self.pool.conn
+
+    def __await__(self):
+        return self._acquire().__await__()
+
+    async def __aenter__(self):
+        return await self._acquire()
+
+    async def __aexit__(self, *exc):
+        await self.pool.release(self.pool.conn)
+
+
+class FakePool:
+    """Hands out one FakeConnection; set ``acquire_error`` to make acquire raise."""
+
+    def __init__(self):
+        self.conn = FakeConnection()
+        self.acquire_error = None
+        self.released = []
+
+    def acquire(self, timeout=None):
+        return _FakeAcquire(self)
+
+    async def release(self, conn):
+        self.released.append(conn)
+
+
+@pytest.fixture
+def fake_pool(monkeypatch):
+    """Serve main.get_pool() (and so get_db and every DB route) from a FakePool."""
+    from backend import main
+
+    pool = FakePool()
+
+    async def get_pool():
+        return pool
+
+    monkeypatch.setattr(main, "get_pool", get_pool)
+    return pool
@@ -1,41 +1,65 @@
+import asyncio
+import json
+
+import httpx
 import pytest
+import pytest_asyncio
+import respx
 from fastapi.testclient import TestClient
 
-import importlib
-
 # Import the FastAPI app
 from backend import main  # assuming tests run from repo root where backend is a package
+import agents.medical_triage_agent as med
+import agents.translation_coordinator_agent as trans
+
+MISTRAL_TRIAGE_URL = "https://api.mistral.ai/v1/medical/triage"
+
+
+def fake_mistral(request: httpx.Request) -> httpx.Response:
+    symptoms = json.loads(request.content)["symptoms"]
+    return httpx.Response(200, json={"esi_level": 4, "analysis": f"Mock analysis for: {symptoms}"})
+
+
+def fake_gemini(request: httpx.Request) -> httpx.Response:
+    # just echo with marker
+    body = json.loads(request.content)
+    target = body["target"]
+    return httpx.Response(200, json={"translatedText": [f"[{target}] {text} (translated)" for text in body["q"]]})
 
-client = TestClient(main.app)
 
 @pytest.fixture(autouse=True)
-def patch_agents(monkeypatch):
-    """Patch external agent calls to avoid real network requests."""
-    import agents.medical_triage_agent as med
-    import agents.translation_coordinator_agent as trans
+def patch_agents():
+    """Intercept agent HTTP calls at the transport so the real client code runs."""
+    med._CACHE.clear()
+    trans._CACHE.clear()
+    with respx.mock(assert_all_called=False) as router:
+        router.post(MISTRAL_TRIAGE_URL).mock(side_effect=fake_mistral)
+        router.post(trans.TRANSLATE_URL).mock(side_effect=fake_gemini)
+        yield router
 
-    async def fake_analyze(symptoms: str, language: str = "en"):
-        return {"esi_level": 4, "analysis": f"Mock analysis for: {symptoms}"}
 
-    async def fake_translate(text: str, target_language: str):
-        # just echo with marker
-        return f"[{target_language}] {text} (translated)"
+# One in-process ASGI client for the whole session; tests share its event loop
+asyncio_session = pytest.mark.asyncio(loop_scope="session")
 
-    monkeypatch.setattr(med, "analyze_symptoms", fake_analyze, raising=True)
-    monkeypatch.setattr(trans, "translate_medical", fake_translate, raising=True)
 
-    yield
+@pytest_asyncio.fixture(scope="session", loop_scope="session")
+async def client():
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as c:
+        yield c
 
 
-def test_health():
-    r = client.get("/api/health")
+@asyncio_session
+async def test_health(client):
+    r = await client.get("/api/health")
     assert r.status_code == 200
     assert r.json()["status"] == "ok"
 
 
-def test_triage_post():
+@asyncio_session
+async def test_triage_post(client):
     payload = {"symptoms": "Chest pain and shortness of breath", "language": "es"}
-    r = client.post("/api/triage", json=payload)
+    r = await client.post("/api/triage", json=payload)
     assert r.status_code == 200
     data = r.json()
     # Validate structure
@@ -47,3 +71,331 @@ def test_triage_post():
     # voice echo
     assert data["voice"]["text"] == payload["symptoms"]
 
+
+
+@asyncio_session
+async def test_emergency_flow_isolates_agent_failures(monkeypatch):
+    from backend import agent_orchestrator as orch
+
+    async def fake_transcribe(audio_bytes: bytes, language: str = "auto"):
+        return {"text": "chest pain", "language": "es", "panic": True}
+
+    async def broken_history(transcript: str):
+        raise RuntimeError("coral down")
+
+    async def fake_vitals(audio_bytes: bytes):
+        return {"stress_level": "high", "heart_rate": 110}
+
+    async def fake_insurance(user_id: str):
+        return {"verified": True, "provider": "Acme"}
+
+    monkeypatch.setattr(orch.voice_interface_agent, "transcribe_audio", fake_transcribe)
+    monkeypatch.setattr(orch.medical_office_triage_voice_agent, "collect_history", broken_history)
+    monkeypatch.setattr(orch.vital_signs_monitor_agent, "analyze_vitals", fake_vitals)
+    monkeypatch.setattr(orch.insurance_verification_agent, "verify_insurance", fake_insurance)
+
+    result = await orch.run_emergency_flow(b"audio")
+    assert result["voice"]["text"] == "chest pain"
+    assert result["triage"]["esi_level"] == 4
+    assert result["translation"].startswith("[es]")
+    assert result["history"]["history"] == "unavailable"
+    assert "coral down" in result["history"]["error"]
+    assert result["vitals"]["heart_rate"] == 110
+    assert result["insurance"]["verified"] is True
+
+
+@asyncio_session
+async def test_translation_batcher_coalesces_by_target(monkeypatch):
+    import agents.translation_coordinator_agent as trans
+
+    calls = []
+
+    async def fake_post(texts, target_language):
+        calls.append((list(texts), target_language))
+        return [f"{target_language}:{t}" for t in texts]
+
+    monkeypatch.setattr(trans, "_post_translations", fake_post)
+
+    batcher = trans.TranslationBatcher(flush_ms=5)
+    results = await asyncio.gather(
+        batcher.translate("a", "es"),
+        batcher.translate("b", "fr"),
+        batcher.translate("c", "es"),
+    )
+
+    assert results == ["es:a", "fr:b", "es:c"]
+    assert sorted(calls) == [(["a", "c"], "es"), (["b"], "fr")]
+
+
+@asyncio_session
+async def test_emergency_flow_deadline_returns_partial_result(monkeypatch):
+    from backend import agent_orchestrator as orch
+
+    async def fake_transcribe(audio_bytes: bytes, language: str = "auto"):
+        return {"text": "fell down", "language": "es", "panic": False}
+
+    async def fake_history(transcript: str):
+        return {"history": "none"}
+
+    async def fake_vitals(audio_bytes: bytes):
+        return {"stress_level": "low", "heart_rate": 72}
+
+    async def hung_insurance(user_id: str):
+        await asyncio.sleep(60)
+
+    monkeypatch.setattr(orch, "FLOW_TIMEOUT_SECONDS", 0.2)
+    monkeypatch.setattr(orch.voice_interface_agent, "transcribe_audio", fake_transcribe)
+    monkeypatch.setattr(orch.medical_office_triage_voice_agent, "collect_history", fake_history)
+    monkeypatch.setattr(orch.vital_signs_monitor_agent, "analyze_vitals", fake_vitals)
+    monkeypatch.setattr(orch.insurance_verification_agent, "verify_insurance", hung_insurance)
+
+    result = await orch.run_emergency_flow(b"audio")
+    assert result["triage"]["esi_level"] == 4
+    assert result["vitals"]["heart_rate"] == 72
+    assert result["insurance"]["verified"] is False
+    assert "flow deadline exceeded" in result["insurance"]["error"]
+
+
+@asyncio_session
+async def test_translation_timeout_fallback_names_the_error(monkeypatch):
+    from backend import agent_orchestrator as orch
+
+    async def fake_transcribe(audio_bytes: bytes, language: str = "auto"):
+        return {"text": "chest pain", "language": "es", "panic": True}
+
+    async def hung_translation(text: str, target_language: str):
+        await asyncio.sleep(60)
+
+    monkeypatch.setitem(orch.AGENT_TIMEOUTS, "translation", 0.05)
+    monkeypatch.setattr(orch.voice_interface_agent, "transcribe_audio", fake_transcribe)
+    monkeypatch.setattr(orch.translation_coordinator_agent, "translate_medical", hung_translation)
+
+    result = await orch.run_emergency_flow(b"audio")
+    assert result["translation"] == "translation_error: TimeoutError"
+
+
+@asyncio_session
+async def test_db_endpoints_report_unavailable_without_database(monkeypatch, client):
+    monkeypatch.setattr(main, "DATABASE_URL", None)
+    r = await client.get("/api/protocols")
+    assert r.status_code == 503
+
+
+@asyncio_session
+async def test_pool_failure_is_logged_and_backed_off(monkeypatch, caplog):
+    import asyncpg
+
+    attempts = []
+
+    async def failing_create_pool(*args, **kwargs):
+        attempts.append(kwargs["timeout"])
+        raise OSError("connection refused")
+
+    monkeypatch.setattr(main, "DATABASE_URL", "postgresql://db.invalid/triage")
+    monkeypatch.setattr(main, "_pool_retry_at", 0.0)
+    monkeypatch.setattr(asyncpg, "create_pool", failing_create_pool)
+    assert await main.get_pool() is None
+    assert await main.get_pool() is None
+    assert attempts == [main.DB_CONNECT_TIMEOUT]
+    assert "Could not open the database pool" in caplog.text
+
+
+@asyncio_session
+async def test_pool_acquire_timeout_reports_unavailable(fake_pool, client):
+    fake_pool.acquire_error = asyncio.TimeoutError()
+    r = await client.get("/api/users")
+    assert r.status_code == 503
+
+
+def test_ws_triage_reports_missing_audio():
+    # httpx's ASGITransport has no WebSocket support; use Starlette's client here
+    with TestClient(main.app).websocket_connect("/ws/triage") as ws:
+        ws.send_json({"audio": ""})
+        frame = ws.receive_json()
+    assert frame == [{"error": "No audio provided."}]
+
+
+def test_ws_triage_batches_results_in_message_order(monkeypatch):
+    import base64
+
+    async def fake_flow(audio_bytes: bytes):
+        # The first message finishes last; its result must still come first
+        await asyncio.sleep(0.1 if audio_bytes == b"slow" else 0)
+        return {"voice": {"text": audio_bytes.decode()}}
+
+    monkeypatch.setattr(main, "run_emergency_flow", fake_flow)
+    monkeypatch.setattr(main, "WS_BATCH_FLUSH_S", 0.05)
+    with TestClient(main.app).websocket_connect("/ws/triage") as ws:
+        for clip in (b"slow", b"fast"):
+            ws.send_json({"audio": base64.b64encode(clip).decode()})
+        frame = ws.receive_json()
+    assert [r["voice"]["text"] for r in frame] == ["slow", "fast"]
+
+
+@asyncio_session
+async def test_hash_password_uses_argon2():
+
+    hashed = await main.hash_password("s3cret")
+    assert hashed.startswith("$argon2id$")
+    assert main.PASSWORD_HASHER.verify(hashed, "s3cret")
+
+
+@asyncio_session
+async def test_mock_ml_api_batch_returns_one_result_per_file(client):
+    files = [("files", (f"clip{i}.wav", b"RIFF", "audio/wav")) for i in range(3)]
+    r = await client.post("/mock-ml-api/batch", files=files)
+    assert r.status_code == 200
+    results = r.json()["results"]
+    assert len(results) == 3
+    for item in results:
+        assert item["stress_level"] in {"low", "medium", "high"}
+        assert 60 <= item["heart_rate"] <= 100
+
+
+def test_verify_jwt_accepts_valid_and_rejects_tampered_tokens():
+    import jwt
+    from fastapi import HTTPException
+
+    token = jwt.encode({"sub": "jdoe"}, main.JWT_SECRET, algorithm=main.ALGORITHM)
+    assert main.verify_jwt(token)["sub"] == "jdoe"
+    with pytest.raises(HTTPException) as exc:
+        main.verify_jwt(token[:-2] + "xx")
+    assert exc.value.status_code == 401
+
+
+@asyncio_session
+async def test_protocols_served_from_cache_with_etag(monkeypatch, client):
+    import time
+
+    body = b'{"protocols":[{"id":1,"name":"CPR"}]}'
+    monkeypatch.setattr(main, "_PROTOCOL_CACHE", (time.monotonic(), body, '"abc"'))
+    r = await client.get("/api/protocols")
+    assert r.status_code == 200
+    assert r.headers["etag"] == '"abc"'
+    assert r.json()["protocols"][0]["name"] == "CPR"
+
+    r = await client.get("/api/protocols", headers={"If-None-Match": '"abc"'})
+    assert r.status_code == 304
+
+
+@asyncio_session
+async def test_crud_routes_build_sql_from_table_spec(monkeypatch, fake_pool, client):
+    from datetime import datetime
+
+    def fetchrow(sql, *args):
+        if sql.startswith("SELECT"):
+            return None
+        return {"id": 7, "username": args[0], "email": args[2], "role": args[3], "created_at": datetime(2025, 1, 1)}
+
+    async def fake_hash(password: str) -> str:
+        return f"hashed:{password}"
+
+    monkeypatch.setattr(main, "hash_password", fake_hash)
+    fake_pool.conn.on("fetchrow", fetchrow)
+
+    r = await client.post("/api/users", json={"username": "jdoe", "password": "pw", "email": "j@x.io", "role": "doctor"})
+    assert r.status_code == 200
+    assert r.json()["id"] == 7 and "password_hash" not in r.json()
+    assert fake_pool.conn.calls[0] == (
+        "fetchrow",
+        "INSERT INTO users (username, password_hash, email, role) VALUES ($1, $2, $3, $4) "
+        "RETURNING id, username, email, role, created_at",
+        ("jdoe", "hashed:pw", "j@x.io", "doctor"),
+    )
+
+    r = await client.get("/api/patients/3")
+    assert r.status_code == 404
+    assert r.json()["detail"] == "Patient not found"
+    assert fake_pool.conn.calls[1][2] == (3,)
+
+
+@asyncio_session
+async def test_bulk_create_rejects_oversized_payload(fake_pool, client):
+    user = {"username": "jdoe", "password": "pw", "email": "j@x.io", "role": "doctor"}
+    r = await client.post("/api/users/bulk", json=[user] * (main.BULK_MAX_ITEMS + 1))
+    assert r.status_code == 422
+    assert fake_pool.conn.calls == []
+
+
+@asyncio_session
+async def test_logs_stream_from_cursor_as_json_or_ndjson(fake_pool, client):
+    rows = [{"id": 2, "symptoms": "cough"}, {"id": 1, "symptoms": "fever"}]
+
+    fake_pool.conn.pages = [rows[:1], rows[1:]]
+    r = await client.get("/api/logs", params={"limit": 2})
+    assert r.status_code == 200
+    assert r.json() == {"logs": rows}
+    assert fake_pool.conn.calls[0][2] == (2,)
+
+    fake_pool.conn.pages = [rows]
+    r = await client.get("/api/logs", params={"limit": 2}, headers={"Accept": "application/x-ndjson"})
+    assert r.headers["content-type"].startswith("application/x-ndjson")
+    assert r.text.splitlines() == ['{"id":2,"symptoms":"cough"}', '{"id":1,"symptoms":"fever"}']
+    assert len(fake_pool.released) == 2
+
+
+@asyncio_session
+async def test_logs_report_unavailable_before_streaming(fake_pool, client):
+    fake_pool.acquire_error = asyncio.TimeoutError()
+    r = await client.get("/api/logs")
+    assert r.status_code == 503
+
+
+@asyncio_session
+async def test_triage_log_copy_failure_falls_back_to_row_inserts(fake_pool, caplog):
+
+    import asyncpg
+
+    too_long = asyncpg.StringDataRightTruncationError("value too long for type character varying(10)")
+
+    def copy(table, records, columns):
+        raise too_long
+
+    def execute(sql, *record):
+        if len(record[1]) > 10:
+            raise too_long
+
+    fake_pool.conn.on("copy_records_to_table", copy)
+    fake_pool.conn.on("execute", execute)
+    good = (None, "en", "cough", 4, "{}")
+    bad = (None, "not-a-language-code", "fever", 3, "{}")
+    await main._flush_triage_logs([good, bad, good])
+    inserted = [args for method, _, args in fake_pool.conn.calls if method == "execute"]
+    assert inserted == [good, bad, good]
+    assert caplog.text.count("Dropped triage log row") == 1
+
+
+def test_tune_socket_sets_nodelay_and_sndbuf():
+    import socket
+    from backend.ws_protocol import WS_SNDBUF_BYTES, tune_socket
+
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        tune_socket(sock)
+        assert sock.getsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY) == 1
+        # Linux doubles the requested size for bookkeeping overhead
+        assert sock.getsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF) >= WS_SNDBUF_BYTES
+
+
+@asyncio_session
+async def test_post_with_retry_retries_transient_status(patch_agents):
+    from agents.http_client import post_with_retry
+
+    url = "http://retry.test/flaky"
+    route = patch_agents.post(url).mock(side_effect=[
+        httpx.Response(503, headers={"Retry-After": "0"}),
+        httpx.Response(200, json={"ok": True}),
+    ])
+    response = await post_with_retry(url, json={})
+    assert response.json() == {"ok": True}
+    assert route.call_count == 2
+
+
+@asyncio_session
+async def test_post_with_retry_raises_after_last_attempt(patch_agents):
+    from agents.http_client import post_with_retry
+
+    url = "http://retry.test/down"
+    route = patch_agents.post(url).mock(return_value=httpx.Response(503, headers={"Retry-After": "0"}))
+    with pytest.raises(httpx.HTTPStatusError):
+        await post_with_retry(url, json={}, max_attempts=3)
+    assert route.call_count == 3
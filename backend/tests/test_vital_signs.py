@@ -0,0 +1,77 @@
+import asyncio
+import io
+
+import numpy as np
+import pytest
+
+torch = pytest.importorskip("torch")
+pytest.importorskip("torchaudio")
+sf = pytest.importorskip("soundfile")
+from fastapi.testclient import TestClient
+
+from backend.vital_signs_agent import main as vitals
+
+
+def wav_bytes(seconds: float = 1.0, sr: int = 22050) -> bytes:
+    rng = np.random.default_rng(0)
+    buf = io.BytesIO()
+    sf.write(buf, (rng.standard_normal(int(sr * seconds)) * 0.1).astype(np.float32), sr, format="WAV")
+    return buf.getvalue()
+
+
+def test_every_worker_builds_the_same_weights():
+    # A fresh import in another worker process runs init_net() with the same seed
+    other = vitals.init_net()
+    for name, tensor in vitals._net.state_dict().items():
+        assert torch.equal(tensor, other.state_dict()[name]), name
+
+
+@pytest.mark.skipif(vitals.single_model is None, reason="numpy fast path is CPU-only")
+def test_single_and_batched_inference_agree():
+    torch.manual_seed(0)
+    features = torch.randn(2000, vitals.N_MFCC)
+    with torch.no_grad():
+        batched = torch.argmax(vitals.model(features), dim=1).tolist()
+    single = [vitals.single_model.predict(row) for row in features.numpy()]
+    assert single == batched
+
+
+def test_inference_batcher_coalesces_concurrent_requests(monkeypatch):
+    calls = []
+    model = vitals.model
+
+    def counting_model(batch):
+        calls.append(batch.shape[0])
+        return model(batch)
+
+    monkeypatch.setattr(vitals, "model", counting_model)
+    features = [torch.randn(1, vitals.N_MFCC) for _ in range(3)]
+
+    async def run():
+        batcher = vitals.InferenceBatcher(flush_ms=5)
+        return await asyncio.gather(*(batcher.predict(f) for f in features))
+
+    results = asyncio.run(run())
+    assert calls == [3]
+    with torch.no_grad():
+        assert results == torch.argmax(model(torch.cat(features)), dim=1).tolist()
+
+
+def test_analyze_serves_repeated_clip_from_cache(monkeypatch):
+    vitals.RESULT_CACHE.clear()
+    predictions = []
+    predict = vitals.BATCHER.predict
+
+    async def counting_predict(features):
+        predictions.append(features)
+        return await predict(features)
+
+    monkeypatch.setattr(vitals.BATCHER, "predict", counting_predict)
+    audio = wav_bytes()
+    with TestClient(vitals.app) as client:
+        first = client.post("/analyze", files={"file": ("a.wav", audio, "audio/wav")})
+        second = client.post("/analyze", files={"file": ("b.wav", audio, "audio/wav")})
+    assert first.status_code == 200
+    assert second.json() == first.json()
+    assert first.json()["stress_level"] in vitals.stress_map.values()
+    assert len(predictions) == 1
@@ -1,7 +1,12 @@
 from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
 import google.generativeai as genai
 from dotenv import load_dotenv
+from cachetools import TTLCache
+import asyncio
+import functools
+import hashlib
 import os
 
 # Load environment variables from .env
@@ -14,6 +19,25 @@ if not API_KEY:
 # Configure Gemini client
 genai.configure(api_key=API_KEY)
 
+MODEL_NAME = "gemini-1.5-flash"
+# Fixed per language pair; sent as system_instruction so every prompt for a pair
+# shares the same prefix and the user turn is just the text
+SYSTEM_TEMPLATE = "Translate the user's text from {source} to {target}. Return only the translation."
+
+@functools.lru_cache(maxsize=256)
+def model_for(source: str, target: str) -> genai.GenerativeModel:
+    """One model object per (source, target) pair, reused by every request."""
+    return genai.GenerativeModel(
+        MODEL_NAME, system_instruction=SYSTEM_TEMPLATE.format(source=source, target=target)
+    )
+
+# Repeated intake phrases skip Gemini entirely. Only touched from the event
+# loop, so no lock is needed around it.
+CACHE = TTLCache(maxsize=int(os.getenv("TRANSLATION_CACHE_SIZE", 10_000)), ttl=86400)
+
+def cache_key(text: str, source: str, target: str) -> bytes:
+    return hashlib.blake2b(f"{source}|{target}|{text}".encode(), digest_size=16).digest()
+
 # FastAPI app
 app = FastAPI(title="GlobalMed Translation Service (Gemini)")
 
@@ -27,19 +51,75 @@ class TranslationRequest(BaseModel):
     source: str = "auto"
     target: str = "en"
 
+# Largest accepted batch, and how many batch-item Gemini calls the process runs at once
+BATCH_MAX_ITEMS = int(os.getenv("TRANSLATION_BATCH_MAX_ITEMS", 100))
+_BATCH_SLOTS = asyncio.Semaphore(int(os.getenv("TRANSLATION_BATCH_CONCURRENCY", 8)))
+
+class BatchRequest(BaseModel):
+    items: list[str] = Field(max_length=BATCH_MAX_ITEMS)
+    source: str = "auto"
+    target: str = "en"
+
+async def _translate(text: str, source: str, target: str) -> str:
+    """Translate one string, serving repeats from CACHE."""
+    key = cache_key(text, source, target)
+    cached = CACHE.get(key)
+    if cached is not None:
+        return cached
+    response = await model_for(source, target).generate_content_async(text)
+    translated = response.text.strip()
+    CACHE[key] = translated
+    return translated
+
 @app.post("/translate")
-def translate_text(req: TranslationRequest) -> dict:
+async def translate_text(req: TranslationRequest) -> dict:
     """
     Uses Gemini to simulate translation.
+    Async end to end, so one worker overlaps many in-flight Gemini calls.
     """
     try:
-        model = genai.GenerativeModel("gemini-1.5-flash")
+        return {"translated_text": await _translate(req.text, req.source, req.target)}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Translation failed: {str(e)}")
 
-        # Prompt Gemini to translate
-        prompt = f"Translate this text from {req.source} to {req.target}:\n{req.text}"
-        response = model.generate_content(prompt)
+@app.post("/translate_batch")
+async def translate_batch(req: BatchRequest) -> dict:
+    """
+    Translates many strings in one HTTP call; the Gemini requests run concurrently,
+    bounded by _BATCH_SLOTS. Results keep the order of ``items``.
+    """
+    async def bounded(text: str) -> str:
+        async with _BATCH_SLOTS:
+            return await _translate(text, req.source, req.target)
 
-        return {"translated_text": response.text.strip()}
+    try:
+        translated = await asyncio.gather(*(bounded(text) for text in req.items))
+        return {"translated_texts": list(translated)}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Translation failed: {str(e)}")
 
+@app.post("/translate/stream")
+async def translate_stream(req: TranslationRequest) -> StreamingResponse:
+    """
+    Same translation as /translate, streamed as plain text while Gemini generates it,
+    so callers can act on the first sentence before the rest arrives.
+    """
+    key = cache_key(req.text, req.source, req.target)
+    cached = CACHE.get(key)
+    if cached is not None:
+        return StreamingResponse(iter([cached]), media_type="text/plain; charset=utf-8")
+    # Open the stream before responding, so a failed request still maps to a 500
+    try:
+        response = await model_for(req.source, req.target).generate_content_async(req.text, stream=True)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Translation failed: {str(e)}")
+
+    async def chunks():
+        parts = []
+        async for chunk in response:
+            parts.append(chunk.text)
+            yield chunk.text
+        # Only a fully received translation is cached
+        CACHE[key] = "".join(parts).strip()
+
+    return StreamingResponse(chunks(), media_type="text/plain; charset=utf-8")
@@ -6,6 +6,25 @@ from typing import Dict
 # Get the ML API URL from environment variable or default to local FastAPI endpoint
 ML_API_URL = os.getenv("ML_API_URL", "http://localhost:8000/mock-ml-api")
 
+# Shared connection pool for every ML call (no per-call client / handshake)
+_LIMITS = httpx.Limits(max_connections=512, max_keepalive_connections=256)
+
+
+def _make_client() -> httpx.AsyncClient:
+    # ML_HTTP_TRANSPORT=aiohttp swaps in the aiohttp-backed transport, which holds
+    # up better than httpx's own pool beyond ~100 concurrent requests
+    if os.getenv("ML_HTTP_TRANSPORT") == "aiohttp":
+        try:
+            from httpx_aiohttp import AiohttpTransport
+        except ImportError:
+            print("[WARN] httpx-aiohttp not installed; using the default httpx transport")
+        else:
+            return httpx.AsyncClient(timeout=20.0, transport=AiohttpTransport(limits=_LIMITS))
+    return httpx.AsyncClient(timeout=20.0, limits=_LIMITS)
+
+
+_CLIENT = _make_client()
+
 
 async def analyze_vitals(audio_bytes: bytes) -> Dict[str, any]:
     """
@@ -22,16 +41,15 @@ async def analyze_vitals(audio_bytes: bytes) -> Dict[str, any]:
     headers = {"Content-Type": "application/octet-stream"}
 
     try:
-        async with httpx.AsyncClient(timeout=20.0) as client:
-            response = await client.post(ML_API_URL, headers=headers, content=audio_bytes)
-            response.raise_for_status()
-            data = response.json()
+        response = await _CLIENT.post(ML_API_URL, headers=headers, content=audio_bytes)
+        response.raise_for_status()
+        data = response.json()
 
-            # Ensure keys exist in the response
-            stress_level = data.get("stress_level", "unknown")
-            heart_rate = data.get("heart_rate", 0)
+        # Ensure keys exist in the response
+        stress_level = data.get("stress_level", "unknown")
+        heart_rate = data.get("heart_rate", 0)
 
-            return {"stress_level": stress_level, "heart_rate": heart_rate}
+        return {"stress_level": stress_level, "heart_rate": heart_rate}
 
     except httpx.RequestError as e:
         # Network or connection error
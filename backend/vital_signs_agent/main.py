@@ -1,12 +1,30 @@
 # main.py
 from fastapi import FastAPI, UploadFile
+from cachetools import LRUCache
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import hashlib
+import os
 import numpy as np
-import librosa
+import soundfile as sf
 import torch
 import torch.nn as nn
+import torchaudio
 
 app = FastAPI(title="Vital Signs Monitor API")
 
+SAMPLE_RATE = 16000
+N_MFCC = 20
+# Concurrent /analyze calls arriving within FLUSH_MS share one forward pass
+FLUSH_MS = float(os.getenv("INFERENCE_BATCH_FLUSH_MS", "5"))
+MAX_BATCH = int(os.getenv("INFERENCE_BATCH_MAX", "32"))
+device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+
+# StressNet is tiny: intra-op thread teams cost more than the math, and request-level
+# concurrency already fills the cores. Interop threads must be set before any torch work.
+torch.set_num_threads(int(os.getenv("TORCH_NUM_THREADS", 1)))
+torch.set_num_interop_threads(int(os.getenv("TORCH_NUM_INTEROP_THREADS", 1)))
+
 # Simple stress classifier neural net
 class StressNet(nn.Module):
     def __init__(self, input_dim=20, hidden_dim=16, output_dim=3):
@@ -14,44 +32,193 @@ class StressNet(nn.Module):
         self.fc1 = nn.Linear(input_dim, hidden_dim)
         self.relu = nn.ReLU()
         self.fc2 = nn.Linear(hidden_dim, output_dim)
-        self.softmax = nn.Softmax(dim=1)
-    
+
     def forward(self, x):
+        # Returns logits: only the argmax is used, and softmax does not change it
         out = self.fc1(x)
         out = self.relu(out)
         out = self.fc2(out)
-        out = self.softmax(out)
         return out
 
-# Initialize model with random weights (MVP)
-model = StressNet()
-model.eval()
+# Lone requests on CPU skip torch via NumpyStressNet. Every path must classify with the
+# same weights, so int8 quantization is only used when this fast path is turned off.
+NUMPY_FAST_PATH = device.type == "cpu" and os.getenv("INFERENCE_NUMPY_FAST_PATH", "1") == "1"
+
+def build_model(net: StressNet, quantize: bool = False) -> torch.jit.ScriptModule:
+    """StressNet frozen by tracing; ``quantize`` swaps in int8 dynamic-quantized Linear layers (CPU only)."""
+    if quantize:
+        net = torch.ao.quantization.quantize_dynamic(net, {nn.Linear}, dtype=torch.qint8)
+    net = net.to(device)
+    with torch.no_grad():
+        return torch.jit.trace(net, torch.zeros(1, N_MFCC, device=device))
+
+class NumpyStressNet:
+    """StressNet's forward pass as two BLAS matvecs, for one feature vector at a time.
+
+    At 20->16->3 the torch call is almost all dispatch overhead; this skips it.
+    """
+
+    def __init__(self, net: StressNet) -> None:
+        def export(t: torch.Tensor) -> np.ndarray:
+            return np.ascontiguousarray(t.detach().cpu().numpy(), dtype=np.float32)
+
+        self.w1, self.b1 = export(net.fc1.weight), export(net.fc1.bias)
+        self.w2, self.b2 = export(net.fc2.weight), export(net.fc2.bias)
+
+    def predict(self, x: np.ndarray) -> int:
+        return int((self.w2 @ np.maximum(self.w1 @ x + self.b1, 0) + self.b2).argmax())
+
+# Random weights (MVP), but seeded: every uvicorn worker must build the same net, or a
+# clip's stress level would depend on which worker served it
+STRESSNET_SEED = int(os.getenv("STRESSNET_SEED", 0))
+
+def init_net(seed: int = STRESSNET_SEED) -> StressNet:
+    # fork_rng keeps the seed from leaking into torch's global RNG state
+    with torch.random.fork_rng():
+        torch.manual_seed(seed)
+        return StressNet().eval()
+
+_net = init_net()
+model = build_model(_net, quantize=device.type == "cpu" and not NUMPY_FAST_PATH)
+# Batches still take one model(batch) call
+single_model = NumpyStressNet(_net) if NUMPY_FAST_PATH else None
+
+# MFCC as fused torch ops (same STFT/mel settings as librosa's defaults), built once
+MFCC = torchaudio.transforms.MFCC(
+    sample_rate=SAMPLE_RATE,
+    n_mfcc=N_MFCC,
+    melkwargs={"n_fft": 2048, "hop_length": 512, "n_mels": 128},
+).to(device)
 
 # Map output index to stress levels
 stress_map = {0: "low", 1: "medium", 2: "high"}
 
+def featurize(y: np.ndarray, sr: int) -> torch.Tensor:
+    """Decoded audio -> (1, 20) mean-MFCC feature tensor on ``device``."""
+    wav = torch.from_numpy(y).to(device)
+    if wav.ndim > 1:
+        # soundfile returns (frames, channels); mix down to mono
+        wav = wav.mean(dim=-1)
+    if sr != SAMPLE_RATE:
+        wav = torchaudio.functional.resample(wav, sr, SAMPLE_RATE)
+    return MFCC(wav).mean(dim=-1).unsqueeze(0)
+
+class InferenceBatcher:
+    """Stacks feature vectors queued within ``flush_ms`` into one ``model(batch)`` call.
+
+    Each caller awaits a future for its own row's argmax.
+    """
+
+    def __init__(self, flush_ms: float = FLUSH_MS, max_batch: int = MAX_BATCH) -> None:
+        self.flush_s = flush_ms / 1000
+        self.max_batch = max_batch
+        self._queue: asyncio.Queue | None = None
+        self._worker: asyncio.Task | None = None
+
+    async def predict(self, features: torch.Tensor) -> int:
+        loop = asyncio.get_running_loop()
+        if self._worker is None or self._worker.done() or self._worker.get_loop() is not loop:
+            self._queue = asyncio.Queue()
+            self._worker = loop.create_task(self._run())
+        future = loop.create_future()
+        self._queue.put_nowait((features, future))
+        return await future
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.flush_s
+            while len(batch) < self.max_batch:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            try:
+                if len(batch) == 1 and single_model is not None:
+                    indices = [single_model.predict(batch[0][0].numpy()[0])]
+                else:
+                    with torch.no_grad():
+                        output = model(torch.cat([features for features, _ in batch]))
+                        indices = torch.argmax(output, dim=1).tolist()
+            except Exception as e:  # noqa
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            for (_, future), idx in zip(batch, indices):
+                if not future.done():
+                    future.set_result(idx)
+
+BATCHER = InferenceBatcher()
+
+# blake2b(audio) -> (stress_level, heart_rate); retries and duplicate clips skip MFCC + inference
+RESULT_CACHE = LRUCache(maxsize=int(os.getenv("ANALYZE_CACHE_SIZE", 4096)))
+
+# Bounded pool for blocking upload I/O, decoding and MFCC, so the event loop never waits on it
+DECODE_EXECUTOR = ThreadPoolExecutor(max_workers=int(os.getenv("DECODE_WORKERS", 8)))
+
+def _digest(f) -> bytes:
+    """Hash an upload in 64 KiB chunks, then rewind it for decoding."""
+    h = hashlib.blake2b(digest_size=16)
+    for chunk in iter(lambda: f.read(1 << 16), b""):
+        h.update(chunk)
+    f.seek(0)
+    return h.digest()
+
+def _decode(f):
+    # libsndfile reads incrementally from the spooled upload (no audioread / ffmpeg fallback)
+    return sf.read(f, dtype="float32")
+
+def _extract_features(f) -> torch.Tensor:
+    """Decode + resample + MFCC in one executor hop; no_grad is per-thread, so it is entered here."""
+    y, sr = _decode(f)
+    with torch.no_grad():
+        return featurize(y, sr)
+
+@app.on_event("shutdown")
+def close_decode_executor():
+    DECODE_EXECUTOR.shutdown(wait=False)
+
+@app.on_event("startup")
+async def warmup():
+    # One dummy pass so the MFCC kernels and torch's lazy init run here
+    # instead of on the first real request
+    with torch.no_grad():
+        model(featurize(np.zeros(SAMPLE_RATE, dtype=np.float32), SAMPLE_RATE))
+
 @app.post("/analyze")
 async def analyze(file: UploadFile):
-    # Read audio bytes
-    audio_bytes = await file.read()
-    
-    # Convert bytes to numpy array using librosa
-    y, sr = librosa.load(librosa.io.BytesIO(audio_bytes), sr=16000)
-    
-    # Extract MFCC features
-    mfccs = librosa.feature.mfcc(y=y, sr=sr, n_mfcc=20)
-    feature_vector = np.mean(mfccs.T, axis=0)
-    
-    # Convert to torch tensor
-    input_tensor = torch.tensor(feature_vector, dtype=torch.float32).unsqueeze(0)
-    
-    # Predict stress
-    with torch.no_grad():
-        output = model(input_tensor)
-        stress_idx = torch.argmax(output, dim=1).item()
-        stress_level = stress_map[stress_idx]
-    
+    # Hash and decode straight from the upload's backing file; no full in-memory copy
+    loop = asyncio.get_running_loop()
+    key = await loop.run_in_executor(DECODE_EXECUTOR, _digest, file.file)
+    cached = RESULT_CACHE.get(key)
+    if cached is not None:
+        stress_level, heart_rate = cached
+        return {"stress_level": stress_level, "heart_rate": heart_rate}
+
+    # Extract MFCC features off the loop, then predict stress in a shared micro-batch
+    input_tensor = await loop.run_in_executor(DECODE_EXECUTOR, _extract_features, file.file)
+    stress_idx = await BATCHER.predict(input_tensor)
+    stress_level = stress_map[stress_idx]
+
     # Mock heart rate (optional: could improve later)
     heart_rate = 70
-    
+
+    RESULT_CACHE[key] = (stress_level, heart_rate)
     return {"stress_level": stress_level, "heart_rate": heart_rate}
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(
+        "main:app",
+        host="0.0.0.0",
+        port=int(os.getenv("PORT", 8000)),
+        # C-backed event loop and HTTP parser; each worker loads its own model copy
+        loop="uvloop",
+        http="httptools",
+        workers=int(os.getenv("WEB_CONCURRENCY", os.cpu_count() or 1)),
+    )
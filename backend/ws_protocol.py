@@ -0,0 +1,29 @@
+"""
+WebSocket protocol tuning for GlobalMedTriage
+- Uvicorn's websockets protocol with per-connection socket options
+- TCP_NODELAY so small batched frames are not held back by Nagle's algorithm
+- Larger SO_SNDBUF so a batched frame is written without stalling on the kernel buffer
+"""
+import os
+import socket
+
+from uvicorn.protocols.websockets.websockets_impl import WebSocketProtocol
+
+WS_SNDBUF_BYTES = int(os.getenv("WS_SNDBUF_BYTES", 256 * 1024))
+
+def tune_socket(sock: socket.socket | None) -> None:
+    """Apply low-latency send options to a connected TCP socket (best effort)."""
+    if sock is None or sock.family not in (socket.AF_INET, socket.AF_INET6):
+        return
+    try:
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, WS_SNDBUF_BYTES)
+    except OSError:
+        pass
+
+class TunedWebSocketProtocol(WebSocketProtocol):
+    """Called by the HTTP protocol on upgrade, so only WebSocket connections are tuned."""
+
+    def connection_made(self, transport) -> None:  # type: ignore[override]
+        tune_socket(transport.get_extra_info("socket"))
+        super().connection_made(transport)
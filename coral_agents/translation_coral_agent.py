@@ -1,10 +1,18 @@
 # coral_agents/translation_coordinator_agent.py
 from coral import Agent, action, Context
-import requests
+import asyncio
+import httpx
 import os
 
 # Use env var to keep it flexible
 TRANSLATION_URL = os.getenv("TRANSLATION_API_URL", "http://translation_service:8000/translate")
+TRANSLATION_BATCH_URL = os.getenv("TRANSLATION_BATCH_API_URL", "http://translation_service:8000/translate_batch")
+
+# One keep-alive pool for every action call instead of a new TCP (+TLS) connection each time
+_CLIENT = httpx.AsyncClient(
+    limits=httpx.Limits(max_connections=200, max_keepalive_connections=100),
+    timeout=httpx.Timeout(30.0),
+)
 
 class TranslationCoordinatorAgent(Agent):
     """
@@ -31,19 +39,43 @@ class TranslationCoordinatorAgent(Agent):
             "target": {"type": "string", "description": "Target language code (e.g. 'en')"}
         }
     )
-    def translate_text(self, ctx: Context, text: str, source: str = "auto", target: str = "en") -> dict:
+    async def translate_text(self, ctx: Context, text: str, source: str = "auto", target: str = "en") -> dict:
         try:
-            response = requests.post(
+            response = await _CLIENT.post(
                 TRANSLATION_URL,
                 json={"text": text, "source": source, "target": target}
             )
             response.raise_for_status()
             result = response.json()
-            return {"translatedText": result.get("translatedText", ""), "source": source, "target": target}
+            return {"translatedText": result.get("translated_text", ""), "source": source, "target": target}
+        except Exception as e:
+            return {"error": str(e)}
+
+    @action(
+        name="translate_batch",
+        description="Translate several medical/emergency texts in one request",
+        parameters={
+            "texts": {"type": "array", "items": {"type": "string"}, "description": "Texts to be translated"},
+            "source": {"type": "string", "description": "Source language code (e.g. 'es')", "default": "auto"},
+            "target": {"type": "string", "description": "Target language code (e.g. 'en')"}
+        }
+    )
+    async def translate_batch(self, ctx: Context, texts: list, source: str = "auto", target: str = "en") -> dict:
+        try:
+            response = await _CLIENT.post(
+                TRANSLATION_BATCH_URL,
+                json={"items": texts, "source": source, "target": target}
+            )
+            response.raise_for_status()
+            result = response.json()
+            return {"translatedTexts": result.get("translated_texts", []), "source": source, "target": target}
         except Exception as e:
             return {"error": str(e)}
 
 # Only run if this agent is launched standalone
 if __name__ == "__main__":
     agent = TranslationCoordinatorAgent()
-    agent.serve()
+    try:
+        agent.serve()
+    finally:
+        asyncio.run(_CLIENT.aclose())
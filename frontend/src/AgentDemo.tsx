@@ -109,7 +109,8 @@ export default function AgentDemo() {
     ws.onmessage = (event) => {
       try {
         const data = JSON.parse(event.data);
-        setResponses(data);
+        // Backend batches results into a JSON array; show the most recent one
+        setResponses(Array.isArray(data) ? data[data.length - 1] : data);
         setStatus('Response received.');
         setError('');
         ws.close();